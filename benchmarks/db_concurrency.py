@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write throughput: default SQLite settings vs. the tuned engine.
+
+Runs reader threads (leaderboard-style ``ORDER BY score LIMIT``) alongside
+writer threads (score increments, task inserts) against a scratch database,
+once with SQLAlchemy defaults and once with the options and pragmas from
+``connectapp.database``, and prints operations per second and lock errors.
+
+Usage:
+    python benchmarks/db_concurrency.py --readers 8 --writers 4 --seconds 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from connectapp.database import engine_options, install_sqlite_pragmas
+
+SCHEMA = [
+    "CREATE TABLE user (id INTEGER PRIMARY KEY, name TEXT, score INTEGER DEFAULT 0)",
+    "CREATE INDEX ix_user_score ON user (score)",
+    "CREATE TABLE daily_task (id INTEGER PRIMARY KEY, user_id INTEGER, task_text TEXT, task_date TEXT)",
+]
+
+
+def seed(engine, users):
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(
+            text("INSERT INTO user (id, name, score) VALUES (:id, :name, :score)"),
+            [{'id': i, 'name': f'user{i}', 'score': random.randint(0, 500)} for i in range(1, users + 1)]
+        )
+
+
+def run(engine, readers, writers, seconds, users):
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        while time.monotonic() < stop:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT id, name, score FROM user ORDER BY score DESC LIMIT 5")).all()
+                    conn.execute(text("SELECT COUNT(*) FROM user WHERE score > :s"), {'s': 250}).scalar()
+                bump('reads')
+            except OperationalError:
+                bump('locked')
+
+    def writer():
+        while time.monotonic() < stop:
+            user_id = random.randint(1, users)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("UPDATE user SET score = score + 20 WHERE id = :id"), {'id': user_id})
+                    conn.execute(
+                        text("INSERT INTO daily_task (user_id, task_text, task_date) VALUES (:u, 'bench', date('now'))"),
+                        {'u': user_id}
+                    )
+                bump('writes')
+            except OperationalError:
+                bump('locked')
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + \
+              [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--users', type=int, default=10000)
+    args = parser.parse_args()
+
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label in ('default', 'tuned'):
+            uri = f"sqlite:///{os.path.join(tmp, label + '.db')}"
+            if label == 'default':
+                # pysqlite's stock 5 s lock wait, no pool sizing, rollback journal
+                engine = create_engine(uri)
+            else:
+                engine = create_engine(uri, **engine_options(uri, config))
+                install_sqlite_pragmas(engine, config)
+            seed(engine, args.users)
+            results[label] = run(engine, args.readers, args.writers, args.seconds, args.users)
+            engine.dispose()
+
+    print(f"{'config':<8} {'reads/s':>10} {'writes/s':>10} {'lock errors':>12}")
+    for label, counts in results.items():
+        print(f"{label:<8} {counts['reads'] / args.seconds:>10.0f} {counts['writes'] / args.seconds:>10.0f} "
+              f"{counts['locked']:>12}")
+
+
+if __name__ == '__main__':
+    main()
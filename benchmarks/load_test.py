@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test: concurrent sessions against the real app with a fake Gemini.
+
+Seeds a scratch database with a synthetic population (users, mutual
+connections, past ``DailyTask`` rows), swaps ``google.generativeai`` for a
+local stand-in with configurable latency and failure rate, then drives
+``/login``, ``/dashboard``, ``/api/daily_task`` and ``/connections`` from
+concurrent Flask test clients, one logged-in user per worker.
+
+Reports p50/p95/p99 latency, throughput and SQL statements per request for
+each endpoint. ``--save`` writes the results as a JSON baseline and
+``--compare`` checks a run against one, exiting non-zero when an endpoint's
+p95 or query count regressed.
+
+Usage:
+    python benchmarks/load_test.py --users 2000 --concurrency 8 --requests 800
+    python benchmarks/load_test.py --compare benchmarks/baselines/load_test.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'loadtest-password'
+
+# Request mix: endpoint -> relative weight
+MIX = {
+    '/dashboard': 5,
+    '/connections': 3,
+    '/api/daily_task': 1,
+    '/login': 1,
+}
+
+FAKE_TASKS = [
+    "Ask a colleague about their weekend plans and share one of your own.",
+    "Compliment someone on their work and ask them about their process.",
+    "Start a conversation with someone in line at a coffee shop.",
+    "Send a message to a friend you haven't talked to in a month.",
+    "Invite a coworker to join you for lunch and ask about their hobbies.",
+]
+
+
+class FakeGenerativeModel:
+    """Stands in for ``genai.GenerativeModel``: sleeps, sometimes fails, returns a canned task."""
+
+    latency = 0.2
+    jitter = 0.05
+    failure_rate = 0.0
+    calls = 0
+    failures = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model_name, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, request_options=None):
+        delay = max(0.0, random.gauss(self.latency, self.jitter))
+        timeout = (request_options or {}).get('timeout')
+        time.sleep(min(delay, timeout) if timeout else delay)
+        failed = random.random() < self.failure_rate or (timeout is not None and delay > timeout)
+        with self._lock:
+            FakeGenerativeModel.calls += 1
+            FakeGenerativeModel.failures += failed
+        if failed:
+            raise RuntimeError("fake upstream error")
+        match = re.search(r'Write (\d+) different challenges', prompt)
+        if match:  # batched inventory prompt: answer with a JSON array of distinct texts
+            count = int(match.group(1))
+            return types.SimpleNamespace(text=json.dumps([
+                f"{random.choice(FAKE_TASKS)[:-1]} (#{random.getrandbits(32):08x})." for _ in range(count)
+            ]))
+        return types.SimpleNamespace(text=random.choice(FAKE_TASKS))
+
+
+def install_fake_genai(latency, jitter, failure_rate):
+    """Register the fake as ``google.generativeai`` before the app imports it."""
+    FakeGenerativeModel.latency = latency
+    FakeGenerativeModel.jitter = jitter
+    FakeGenerativeModel.failure_rate = failure_rate
+
+    fake = types.ModuleType('google.generativeai')
+    fake.configure = lambda **kwargs: None
+    fake.GenerativeModel = FakeGenerativeModel
+    google = sys.modules.get('google')
+    if google is None:
+        try:
+            import google
+        except ImportError:
+            google = types.ModuleType('google')
+            google.__path__ = []
+            sys.modules['google'] = google
+    google.generativeai = fake
+    sys.modules['google.generativeai'] = fake
+    os.environ.setdefault('GEMINI_API_KEY', 'fake-key')
+
+
+def seed(db, args):
+    """Bulk-insert users, mutual connections and task history; returns (connections, tasks) counts."""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+
+    from connectapp.models import DailyTask, User, connections
+    from connectapp.utils.auth_utils import password_hasher
+
+    rng = random.Random(args.seed)
+    password_hash = generate_password_hash(PASSWORD, method=password_hasher.method)
+    codes = User.allocate_referral_codes(args.users)
+    db.session.execute(insert(User), [
+        {
+            'id': i,
+            'name': f'Load User {i}',
+            'age': rng.randint(18, 70),
+            'email': f'load{i}@example.com',
+            'password_hash': password_hash,
+            'referral_code': codes[i - 1],
+            'profile_pic': 'default.jpg',
+            'score': rng.randint(0, 2000)
+        }
+        for i in range(1, args.users + 1)
+    ])
+
+    edges = set()
+    for user_id in range(1, args.users + 1):
+        for friend_id in rng.sample(range(1, args.users + 1), min(args.friends, args.users - 1)):
+            if friend_id != user_id:
+                edges.add((user_id, friend_id))
+                edges.add((friend_id, user_id))
+    today = date.today()
+    db.session.execute(insert(connections), [
+        {'user_id': u, 'friend_id': f, 'connected_on': today - timedelta(days=rng.randint(0, 365))}
+        for u, f in edges
+    ])
+
+    history = [
+        {
+            'user_id': user_id,
+            'task_text': rng.choice(FAKE_TASKS),
+            'completed': rng.random() < 0.6,
+            'task_date': today - timedelta(days=day),
+            'difficulty': rng.choice(('easy', 'medium', 'hard')),
+            'created_at': datetime.utcnow() - timedelta(days=day)
+        }
+        for user_id in range(1, args.users + 1)
+        for day in range(1, args.history_days + 1)
+    ]
+    for start in range(0, len(history), 10000):
+        db.session.execute(insert(DailyTask), history[start:start + 10000])
+    db.session.commit()
+    return len(edges), len(history)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run(app, db, args):
+    """Drive the request mix from ``args.concurrency`` workers; returns per-endpoint samples."""
+    from sqlalchemy import event
+
+    local = threading.local()
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        local.queries = getattr(local, 'queries', 0) + 1
+
+    samples = defaultdict(list)  # endpoint -> [(seconds, queries, ok)]
+    lock = threading.Lock()
+    rng = random.Random(args.seed)
+    user_ids = rng.sample(range(1, args.users + 1), args.concurrency)
+    per_worker = max(args.requests // args.concurrency, 1)
+    endpoints, weights = zip(*MIX.items())
+
+    def request(client, endpoint, user_id, logged_in=True):
+        if endpoint == '/login' and logged_in:
+            client.get('/logout')  # untimed; /login short-circuits for signed-in users
+        local.queries = 0
+        started = time.perf_counter()
+        if endpoint == '/login':
+            response = client.post('/login', data={'email': f'load{user_id}@example.com', 'password': PASSWORD})
+            ok = response.status_code == 302 and '/dashboard' in response.headers.get('Location', '')
+        elif endpoint == '/api/daily_task':
+            response = client.post(endpoint)
+            ok = response.status_code == 200
+        else:
+            response = client.get(endpoint)
+            ok = response.status_code == 200
+        elapsed = time.perf_counter() - started
+        with lock:
+            samples[endpoint].append((elapsed, local.queries, ok))
+
+    def worker(user_id, worker_seed):
+        worker_rng = random.Random(worker_seed)
+        with app.test_client() as client:
+            request(client, '/login', user_id, logged_in=False)
+            for _ in range(per_worker - 1):
+                request(client, worker_rng.choices(endpoints, weights)[0], user_id)
+
+    threads = [threading.Thread(target=worker, args=(user_id, args.seed + n)) for n, user_id in enumerate(user_ids)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall):
+    results = {}
+    for endpoint in MIX:
+        rows = samples.get(endpoint, [])
+        latencies = sorted(seconds * 1000 for seconds, _, _ in rows)
+        results[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(1 for _, _, ok in rows if not ok),
+            'rps': round(len(rows) / wall, 2) if wall else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries_per_request': round(sum(q for _, q, _ in rows) / len(rows), 2) if rows else 0.0,
+        }
+    total = sum(len(rows) for rows in samples.values())
+    return {'wall_seconds': round(wall, 2), 'total_rps': round(total / wall, 2) if wall else 0.0, 'endpoints': results}
+
+
+def print_report(report):
+    print(f"{'endpoint':<16} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'queries':>8}")
+    for endpoint, row in report['endpoints'].items():
+        print(f"{endpoint:<16} {row['requests']:>6} {row['errors']:>6} {row['rps']:>8.1f} {row['p50_ms']:>9.1f} "
+              f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['queries_per_request']:>8.1f}")
+    print(f"total: {report['total_rps']:.1f} req/s over {report['wall_seconds']:.1f} s; "
+          f"fake Gemini calls: {report['llm_calls']} ({report['llm_failures']} failed)")
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """Return human-readable regressions of ``report`` against ``baseline``."""
+    regressions = []
+    if baseline.get('params') != report['params']:
+        print("note: baseline was recorded with different parameters; latencies may not be comparable")
+    for endpoint, old in baseline['endpoints'].items():
+        new = report['endpoints'].get(endpoint)
+        if not new or not old['requests']:
+            continue
+        # Millisecond-scale endpoints jitter by a few ms between runs; ignore changes below min_delta_ms
+        if new['p95_ms'] > old['p95_ms'] * (1 + tolerance) and new['p95_ms'] - old['p95_ms'] > min_delta_ms:
+            regressions.append(f"{endpoint}: p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms")
+        # Query counts barely vary between runs, so any real growth is a regression
+        if new['queries_per_request'] > old['queries_per_request'] + 0.5:
+            regressions.append(f"{endpoint}: queries/request {old['queries_per_request']:.1f} -> "
+                               f"{new['queries_per_request']:.1f}")
+        if new['errors'] > old['errors']:
+            regressions.append(f"{endpoint}: errors {old['errors']} -> {new['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--friends', type=int, default=10, help='Random friends added per user (mutual).')
+    parser.add_argument('--history-days', type=int, default=30, help='Past daily tasks per user.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=800, help='Total requests across all workers.')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Fake Gemini mean latency in seconds.')
+    parser.add_argument('--llm-jitter', type=float, default=0.05)
+    parser.add_argument('--llm-failure-rate', type=float, default=0.05)
+    parser.add_argument('--provider', choices=('gemini', 'local', 'inventory', 'hybrid'), default='gemini',
+                        help='TASK_PROVIDER for the run.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', metavar='PATH', help='Write the results as a JSON baseline.')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a JSON baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 growth (fraction).')
+    parser.add_argument('--min-delta-ms', type=float, default=10.0, help='Ignore p95 growth smaller than this.')
+    args = parser.parse_args()
+
+    install_fake_genai(args.llm_latency, args.llm_jitter, args.llm_failure_rate)
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        os.environ.setdefault('AI_CACHE_ENABLED', '0')
+        os.environ['TASK_PROVIDER'] = args.provider
+
+        from connectapp import create_app
+        from connectapp.extensions import db
+        from connectapp.migrations import upgrade_schema
+
+        app = create_app()
+        with app.app_context():
+            upgrade_schema(db.engine, db.metadata, log=lambda message: None)
+            started = time.perf_counter()
+            edges, history = seed(db, args)
+            print(f"seeded {args.users} users, {edges} connections, {history} past tasks "
+                  f"in {time.perf_counter() - started:.1f} s")
+            samples, wall = run(app, db, args)
+            db.engine.dispose()
+
+    report = summarize(samples, wall)
+    report['llm_calls'] = FakeGenerativeModel.calls
+    report['llm_failures'] = FakeGenerativeModel.failures
+    report['params'] = {key: value for key, value in vars(args).items() if key not in ('save', 'compare', 'tolerance', 'min_delta_ms')}
+    print_report(report)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("no regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
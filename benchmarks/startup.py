@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Startup time: ``import connectapp`` and ``create_app()`` in fresh interpreters.
+
+Each run starts a new Python process against a scratch database, times the
+package import and the app factory separately and checks that the Gemini
+SDK (slower to import than the rest of the app together) is not imported
+until a request needs it. Reports the median over ``--runs``
+and, with ``--importtime``, the slowest modules from ``python -X importtime``.
+
+``--save`` writes the results as a JSON baseline and ``--compare`` checks a
+run against one, exiting non-zero when either phase got slower or a lazy
+module is imported on startup again.
+
+Usage:
+    python benchmarks/startup.py --runs 7 --importtime
+    python benchmarks/startup.py --compare benchmarks/baselines/startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules the app must not import until they're actually used
+LAZY_MODULES = ('google.generativeai',)
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import connectapp
+imported = time.perf_counter()
+connectapp.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'loaded': [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def _env(tmp):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+    env['SCORE_FLUSH_INTERVAL'] = '0'
+    env.setdefault('GEMINI_API_KEY', 'fake-key')
+    return env
+
+
+def probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], env=env, cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top):
+    """(cumulative ms, module) for the ``top`` slowest imports of ``connectapp``."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import connectapp'], env=env, cwd=ROOT,
+                            check=True, capture_output=True, text=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative) / 1000, name.strip()))
+    # Cumulative times nest (a package includes its submodules), which is what points at the culprit
+    return sorted(modules, reverse=True)[:top]
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """Return human-readable regressions of ``report`` against ``baseline``."""
+    regressions = []
+    for phase in ('import_ms', 'create_app_ms'):
+        old, new = baseline[phase], report[phase]
+        if new > old * (1 + tolerance) and new - old >= min_delta_ms:
+            regressions.append(f"{phase}: {old:.1f} -> {new:.1f} ms")
+    for name in sorted(set(report['loaded']) - set(baseline['loaded'])):
+        regressions.append(f"{name} is imported on startup")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true', help='List the slowest imports.')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--save', metavar='PATH', help='Write the results as a JSON baseline.')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a JSON baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed growth per phase (fraction).')
+    parser.add_argument('--min-delta-ms', type=float, default=50.0, help='Ignore growth smaller than this.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(tmp)
+        probe(env)  # warm the bytecode and OS file caches
+        samples = [probe(env) for _ in range(args.runs)]
+        top = slowest_imports(env, args.top) if args.importtime else []
+
+    report = {
+        'import_ms': round(statistics.median(sample['import_ms'] for sample in samples), 1),
+        'create_app_ms': round(statistics.median(sample['create_app_ms'] for sample in samples), 1),
+        'loaded': sorted(set().union(*(sample['loaded'] for sample in samples))),
+        'runs': args.runs,
+    }
+    print(f"import connectapp: {report['import_ms']:8.1f} ms (median of {args.runs})")
+    print(f"create_app():      {report['create_app_ms']:8.1f} ms")
+    print(f"lazy modules loaded on startup: {', '.join(report['loaded']) or 'none'}")
+    if top:
+        print("slowest imports (cumulative):")
+        for ms, name in top:
+            print(f"  {ms:8.1f} ms  {name}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("no regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,27 @@ import os
 from flask import Flask
 from config import Config
 from .extensions import db, login_manager
+from .database import normalize_database_uri, engine_options, configure_engine
+from .commands import register_commands
 from .models import User  # Import User model
 from .routes.auth_routes import auth_bp
 from .routes.dashboard_routes import dashboard_bp
 from .routes.profile_routes import profile_bp
+from .routes.metrics_routes import metrics_bp
+from .routes.analytics_routes import analytics_bp
+from .utils.leaderboard_utils import leaderboard
+from .utils.cache_utils import ai_cache
+from .utils.job_utils import job_queue
+from .utils.image_utils import image_pipeline
+from .utils.asset_utils import assets
+from .utils.graph_utils import connection_graph
+from .utils.auth_utils import password_hasher
+from .utils.user_cache_utils import session_user_cache
+from .utils.metrics_utils import metrics
+from .utils.task_provider_utils import configure_task_provider
+from .utils.inventory_utils import task_inventory
+from .utils.prompt_utils import prompt_builder
+from .utils.score_utils import score_ledger
 
 def create_app():
     # Get the absolute path to the project root
@@ -17,20 +34,50 @@ def create_app():
         static_folder=os.path.join(project_root, 'static') # Explicitly set static folder path
     )
     app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config.setdefault(
+        'SQLALCHEMY_ENGINE_OPTIONS',
+        engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config)
+    )
 
     db.init_app(app)
+    configure_engine(app, db)
     login_manager.init_app(app)
+    leaderboard.configure(app.config['LEADERBOARD_SIZE'], app.config['LEADERBOARD_CACHE_TTL'])
+    ai_cache.configure(
+        os.path.join(app.instance_path, app.config['AI_CACHE_FILE']) if app.config['AI_CACHE_ENABLED'] else None,
+        app.config['AI_CACHE_MAX_ENTRIES'],
+        app.config['AI_CACHE_TTL']
+    )
+    job_queue.init_app(app)
+    task_inventory.init_app(app)
+    configure_task_provider(app.config['TASK_PROVIDER'])
+    prompt_builder.configure(app.config['PROMPT_CONTEXT_TOKENS'], app.config['PROMPT_MAX_TASK_CHARS'])
+    image_pipeline.init_app(app)
+    score_ledger.init_app(app)
+    assets.init_app(app)
+    connection_graph.configure(app.config['GRAPH_CACHE_USERS'], app.config['GRAPH_CACHE_TTL'])
+    password_hasher.init_app(app)
+    session_user_cache.configure(app.config['SESSION_USER_CACHE_TTL'], app.config['SESSION_USER_CACHE_SIZE'])
+    metrics.init_app(app, db)
+    metrics.add_collector('ai_cache', ai_cache.stats)
+    metrics.add_collector('connection_graph', connection_graph.stats)
+    metrics.add_collector('password_hasher', password_hasher.stats)
+    metrics.add_collector('score_ledger', score_ledger.stats)
+    metrics.add_collector('session_user_cache', session_user_cache.stats)
+    metrics.add_collector('task_inventory', task_inventory.stats)
 
-    # User loader for Flask-Login
+    # User loader for Flask-Login; served from the per-process cache when fresh
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
-
-    with app.app_context():
-        db.create_all()  # Create database tables
+        return session_user_cache.load(int(user_id))
 
     app.register_blueprint(auth_bp, url_prefix='/')
     app.register_blueprint(dashboard_bp, url_prefix='/')
     app.register_blueprint(profile_bp, url_prefix='/')
+    app.register_blueprint(metrics_bp, url_prefix='/')
+    app.register_blueprint(analytics_bp, url_prefix='/')
+
+    register_commands(app)
 
     return app
@@ -0,0 +1,248 @@
+import click
+from datetime import date, timedelta
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+@click.command('pregenerate-tasks')
+@click.option('--date', 'task_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Day to generate tasks for (default: tomorrow).')
+@click.option('--workers', type=int, default=None, help='Concurrent upstream calls.')
+@click.option('--rate', type=float, default=None, help='Max upstream calls per second.')
+@click.option('--batch-size', type=int, default=50, help='Rows per commit.')
+@click.option('--all-users', is_flag=True, help='Include users with no recent activity.')
+@with_appcontext
+def pregenerate_tasks_command(task_date, workers, rate, batch_size, all_users):
+    """Pre-generate daily tasks so dashboard requests never wait on Gemini.
+
+    Safe to rerun: users who already have a task for the day are skipped.
+    """
+    from connectapp.utils.pregeneration_utils import pregenerate_tasks
+    from connectapp.utils.progress_utils import get_user_progress
+
+    config = current_app.config
+    pregenerate_tasks(
+        task_date.date() if task_date else date.today() + timedelta(days=1),
+        get_user_progress,
+        workers=workers or config['PREGENERATE_WORKERS'],
+        rate=rate if rate is not None else config['PREGENERATE_RATE'],
+        batch_size=batch_size,
+        active_days=None if all_users else config['ACTIVE_USER_DAYS'],
+        log=click.echo
+    )
+
+
+@click.command('process-profile-pics')
+@with_appcontext
+def process_profile_pics_command():
+    """Re-encode legacy profile pictures into deduplicated, bounded avatars.
+
+    Original files are left in place; remove them once nothing references them.
+    """
+    import os
+    from connectapp.extensions import db
+    from connectapp.models import User
+    from connectapp.utils.image_utils import image_pipeline
+
+    converted = 0
+    for user in User.query.all():
+        path = os.path.join(image_pipeline.folder, user.profile_pic or '')
+        if image_pipeline.is_processed(user.profile_pic) or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            avatar = image_pipeline.process(data, image_pipeline.digest(data))
+        except Exception as e:
+            click.echo(f"user {user.id}: skipped {user.profile_pic} ({e})")
+            continue
+        new_size = os.path.getsize(os.path.join(image_pipeline.folder, avatar))
+        click.echo(f"user {user.id}: {user.profile_pic} ({len(data)} B) -> {avatar} ({new_size} B)")
+        user.profile_pic = avatar
+        converted += 1
+    db.session.commit()
+    click.echo(f"done: {converted} converted")
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint static files into the asset manifest used by url_for('static')."""
+    from connectapp.utils.asset_utils import assets
+
+    entries = assets.build()
+    click.echo(f"{len(entries)} assets written to {assets.manifest_path}")
+
+
+@click.command('refresh-suggestions')
+@with_appcontext
+def refresh_suggestions_command():
+    """Rebuild "people you may know" suggestions for every user."""
+    from connectapp.utils.suggestion_utils import refresh_suggestions
+
+    written = refresh_suggestions()
+    click.echo(f"{written} suggestions written")
+
+
+@click.command('import-users')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Input format (default: from the file extension).')
+@click.option('--chunk-size', type=int, default=500, help='Users per transaction.')
+@click.option('--workers', type=int, default=None, help='Password hashing processes (default: CPU count).')
+@with_appcontext
+def import_users_command(source, fmt, chunk_size, workers):
+    """Bulk-import users from a CSV or NDJSON file with name, age, email, password.
+
+    Use - to read from stdin. Emails that already exist are skipped, so an
+    interrupted import can be rerun.
+    """
+    from connectapp.utils.import_utils import import_users, read_records
+    from connectapp.utils.leaderboard_utils import leaderboard
+
+    if fmt is None:
+        fmt = 'csv' if source.name.endswith('.csv') else 'ndjson'
+    result = import_users(read_records(source, fmt), chunk_size=chunk_size, workers=workers, log=click.echo)
+    leaderboard.invalidate()
+    click.echo(f"done: {result['created']} created, {result['skipped_existing']} already existed, "
+               f"{result['invalid']} invalid")
+
+
+@click.command('refill-inventory')
+@click.option('--difficulty', type=click.Choice(['easy', 'medium', 'hard']), multiple=True,
+              help='Tier to refill (repeatable; default: all).')
+@click.option('--target', type=int, default=None, help='Available tasks to stock per tier (default: TASK_INVENTORY_TARGET).')
+@with_appcontext
+def refill_inventory_command(difficulty, target):
+    """Stock the shared task inventory with batched Gemini calls."""
+    from connectapp.utils.inventory_utils import DIFFICULTIES, task_inventory
+
+    for tier in difficulty or DIFFICULTIES:
+        added = task_inventory.refill(tier, target, log=click.echo)
+        click.echo(f"{tier}: {added} added, {task_inventory.available(tier)} available")
+
+
+@click.command('flush-scores')
+@with_appcontext
+def flush_scores_command():
+    """Fold all unapplied score events into user scores now."""
+    from connectapp.utils.score_utils import score_ledger
+
+    applied = score_ledger.flush_all()
+    click.echo(f"{applied} score events applied, {score_ledger.pending()} pending")
+
+
+@click.command('rollup-analytics')
+@click.option('--through', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Last day to roll up (default: yesterday).')
+@click.option('--reroll-days', type=int, default=None,
+              help='Latest rolled-up days to recompute (default: ANALYTICS_REROLL_DAYS).')
+@with_appcontext
+def rollup_analytics_command(through, reroll_days):
+    """Aggregate finished days into the analytics rollup tables.
+
+    Incremental: only days since the last run are read from daily_task. Run it daily (e.g. from cron).
+    """
+    from connectapp.utils.analytics_utils import rollup
+
+    written = rollup(
+        through.date() if through else None,
+        reroll_days if reroll_days is not None else current_app.config['ANALYTICS_REROLL_DAYS'],
+        log=click.echo
+    )
+    click.echo(f"{written} days written")
+
+
+@click.command('archive-tasks')
+@click.option('--days', type=int, default=None, help='Days of tasks to keep hot (default: TASK_RETENTION_DAYS).')
+@click.option('--batch-size', type=int, default=None, help='Tasks per transaction (default: TASK_ARCHIVE_BATCH).')
+@with_appcontext
+def archive_tasks_command(days, batch_size):
+    """Move old daily tasks into compressed archive chunks.
+
+    Days are only archived once rolled up (flask rollup-analytics). Safe to interrupt and rerun.
+    """
+    from connectapp.utils.retention_utils import archive_stats, archive_tasks
+
+    config = current_app.config
+    result = archive_tasks(
+        days if days is not None else config['TASK_RETENTION_DAYS'],
+        batch_size or config['TASK_ARCHIVE_BATCH'],
+        log=click.echo
+    )
+    click.echo(f"{result['archived']} tasks archived in {result['chunks']} chunks (before {result['cutoff']})")
+    for key, value in archive_stats().items():
+        click.echo(f"  {key}: {value}")
+
+
+def _print_plans(title, plans):
+    click.echo(title)
+    for label, rows in plans.items():
+        click.echo(f"  {label}:")
+        for row in rows:
+            click.echo(f"    {row}")
+
+
+@click.command('db-upgrade')
+@click.option('--target', type=int, default=None, help='Stop at this schema version (default: latest).')
+@click.option('--explain', is_flag=True, help='Print EXPLAIN QUERY PLAN for the hot queries before and after.')
+@with_appcontext
+def db_upgrade_command(target, explain):
+    """Create missing tables and apply pending schema migrations. Safe to rerun."""
+    from connectapp.extensions import db
+    from connectapp.migrations import current_version, explain_hot_queries, missing_tables, upgrade_schema
+
+    before = explain_hot_queries(db.engine) if explain and not missing_tables(db.engine, db.metadata) else None
+    ran = upgrade_schema(db.engine, db.metadata, target, log=click.echo)
+    click.echo(f"schema at version {current_version(db.engine)} ({len(ran)} applied)")
+    if explain:
+        if before is not None:
+            _print_plans('before:', before)
+        _print_plans('after:', explain_hot_queries(db.engine))
+
+
+@click.command('db-downgrade')
+@click.argument('target', type=int)
+@with_appcontext
+def db_downgrade_command(target):
+    """Revert schema migrations newer than TARGET (0 reverts all)."""
+    from connectapp.extensions import db
+    from connectapp.migrations import current_version, downgrade
+
+    ran = downgrade(db.engine, target, log=click.echo)
+    click.echo(f"schema at version {current_version(db.engine)} ({len(ran)} reverted)")
+
+
+@click.command('db-status')
+@click.option('--explain', is_flag=True, help='Also print EXPLAIN QUERY PLAN for the hot queries.')
+@with_appcontext
+def db_status_command(explain):
+    """Show missing tables and applied and pending schema migrations."""
+    from connectapp.extensions import db
+    from connectapp.migrations import MIGRATIONS, applied_versions, explain_hot_queries, missing_tables
+
+    missing = missing_tables(db.engine, db.metadata)
+    if missing:
+        click.echo(f"missing tables (run db-upgrade): {', '.join(missing)}")
+    applied = set(applied_versions(db.engine))
+    for migration in MIGRATIONS:
+        state = 'applied' if migration.version in applied else 'pending'
+        click.echo(f"{migration.version:>4}  {state:<8} {migration.name}")
+    if explain and not missing:
+        _print_plans('query plans:', explain_hot_queries(db.engine))
+
+
+def register_commands(app):
+    """Attach the ConnectApp CLI commands to ``app``."""
+    app.cli.add_command(pregenerate_tasks_command)
+    app.cli.add_command(process_profile_pics_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(refresh_suggestions_command)
+    app.cli.add_command(import_users_command)
+    app.cli.add_command(refill_inventory_command)
+    app.cli.add_command(flush_scores_command)
+    app.cli.add_command(rollup_analytics_command)
+    app.cli.add_command(archive_tasks_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_downgrade_command)
+    app.cli.add_command(db_status_command)
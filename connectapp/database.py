@@ -0,0 +1,76 @@
+"""Database engine setup: URI normalization, pool sizing and SQLite tuning."""
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def normalize_database_uri(uri: str) -> str:
+    """Accept the ``postgres://`` scheme many hosts hand out; SQLAlchemy wants ``postgresql://``."""
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(uri: str, config) -> Dict:
+    """
+    Build ``SQLALCHEMY_ENGINE_OPTIONS`` for ``uri`` from the app ``config``.
+
+    File-backed SQLite and server databases get a bounded connection pool;
+    SQLite additionally gets a driver-level busy timeout so writers wait for
+    the lock instead of failing with ``database is locked``.
+    """
+    url = make_url(uri)
+    if _is_memory_sqlite(url):
+        return {}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() == 'sqlite':
+        options['connect_args'] = {
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            'check_same_thread': False,
+        }
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = config['DB_POOL_RECYCLE']
+    return options
+
+
+def configure_engine(app, db):
+    """Install per-connection SQLite pragmas on the app's engine (no-op for other backends)."""
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config)
+
+
+def install_sqlite_pragmas(engine, config):
+    """Run WAL/synchronous/busy-timeout/mmap pragmas on each new SQLite connection of ``engine``."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = [
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    # WAL lets readers proceed while a writer commits; it's a no-op for in-memory databases
+    if config['SQLITE_WAL'] and not _is_memory_sqlite(engine.url):
+        pragmas.insert(0, "PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
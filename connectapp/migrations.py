@@ -0,0 +1,250 @@
+"""
+Versioned schema migrations.
+
+Each migration has an ``up`` and a ``down`` step that receive a SQLAlchemy
+connection inside a transaction. Applied versions are recorded in the
+``schema_version`` table, so ``upgrade()`` only runs what is missing and is
+safe to call repeatedly. Steps are written to be idempotent themselves as
+well: tables created from the models already have the columns and indexes,
+and the migrations then only record their version.
+
+The app never touches the schema on startup; ``upgrade_schema()`` (``flask
+db-upgrade``) is the deploy step that creates missing tables and migrates.
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+
+VERSION_TABLE = 'schema_version'
+
+# Built with SQLAlchemy types so every backend gets its own DDL (PostgreSQL has no DATETIME)
+_version_table = Table(
+    VERSION_TABLE, MetaData(),
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    up: Callable
+    down: Callable
+
+
+def _columns(conn, table: str) -> List[str]:
+    return [column['name'] for column in inspect(conn).get_columns(table)]
+
+
+def _up_daily_task_columns(conn):
+    # What migrate_database.py used to do by hand
+    columns = _columns(conn, 'daily_task')
+    if 'difficulty' not in columns:
+        conn.execute(text("ALTER TABLE daily_task ADD COLUMN difficulty VARCHAR(20) DEFAULT 'medium'"))
+    if 'created_at' not in columns:
+        conn.execute(text(f"ALTER TABLE daily_task ADD COLUMN created_at {DateTime().compile(dialect=conn.dialect)}"))
+    conn.execute(text("UPDATE daily_task SET difficulty = 'medium' WHERE difficulty IS NULL"))
+    conn.execute(text("UPDATE daily_task SET created_at = :now WHERE created_at IS NULL"),
+                 {'now': datetime.utcnow()})
+
+
+def _down_daily_task_columns(conn):
+    # The columns are part of the model; removing them would break the app
+    pass
+
+
+def _up_hot_path_indexes(conn):
+    # Keep one task per user and day before the unique index goes on: the
+    # completed one if any, else the oldest. AI jobs follow the kept row.
+    duplicates = conn.execute(text("""
+        SELECT user_id, task_date FROM daily_task
+        GROUP BY user_id, task_date HAVING COUNT(*) > 1
+    """)).all()
+    for user_id, task_date in duplicates:
+        ids = [row_id for (row_id,) in conn.execute(text("""
+            SELECT id FROM daily_task WHERE user_id = :user_id AND task_date = :task_date
+            ORDER BY CASE WHEN completed THEN 0 ELSE 1 END, id
+        """), {'user_id': user_id, 'task_date': task_date})]
+        keep, drop = ids[0], ids[1:]
+        params = [{'keep': keep, 'drop': row_id} for row_id in drop]
+        if inspect(conn).has_table('ai_job'):
+            conn.execute(text("UPDATE ai_job SET task_id = :keep WHERE task_id = :drop"), params)
+        conn.execute(text("DELETE FROM daily_task WHERE id = :drop"), params)
+
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_daily_task_user_date "
+                      "ON daily_task (user_id, task_date)"))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_score ON "user" (score)'))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_connections_friend_id ON connections (friend_id)"))
+
+
+def _down_hot_path_indexes(conn):
+    conn.execute(text("DROP INDEX IF EXISTS ix_connections_friend_id"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_user_score"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_daily_task_user_date"))
+
+
+def _up_progress_streaks(conn):
+    if not inspect(conn).has_table('user_progress'):
+        return  # created with the columns by upgrade_schema()
+    columns = _columns(conn, 'user_progress')
+    if 'current_streak' not in columns:
+        conn.execute(text("ALTER TABLE user_progress ADD COLUMN current_streak INTEGER NOT NULL DEFAULT 0"))
+    if 'best_streak' not in columns:
+        conn.execute(text("ALTER TABLE user_progress ADD COLUMN best_streak INTEGER NOT NULL DEFAULT 0"))
+    if 'last_completed_on' not in columns:
+        conn.execute(text("ALTER TABLE user_progress ADD COLUMN last_completed_on DATE"))
+    # Existing rows get their streaks on the next daily rebuild
+    conn.execute(text("UPDATE user_progress SET computed_on = window_start"))
+
+
+def _down_progress_streaks(conn):
+    # The columns are part of the model; removing them would break the app
+    pass
+
+
+def _up_analytics_indexes(conn):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_daily_task_date ON daily_task (task_date)"))
+    if inspect(conn).has_table('referral_history'):
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_referral_history_date ON referral_history (date)"))
+
+
+def _down_analytics_indexes(conn):
+    conn.execute(text("DROP INDEX IF EXISTS ix_referral_history_date"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_daily_task_date"))
+
+
+def _up_password_hash_length(conn):
+    # SQLite doesn't enforce VARCHAR lengths; elsewhere a longer rehash would be rejected at login
+    if conn.dialect.name == 'sqlite' or not inspect(conn).has_table('user'):
+        return
+    column = next(column for column in inspect(conn).get_columns('user') if column['name'] == 'password_hash')
+    if (getattr(column['type'], 'length', None) or 256) < 256:
+        conn.execute(text('ALTER TABLE "user" ALTER COLUMN password_hash TYPE VARCHAR(256)'))
+
+
+def _down_password_hash_length(conn):
+    # Narrowing the column again would truncate hashes that need the room
+    pass
+
+
+def _up_ai_job_task_index(conn):
+    if inspect(conn).has_table('ai_job'):
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ai_job_task_id ON ai_job (task_id)"))
+
+
+def _down_ai_job_task_index(conn):
+    conn.execute(text("DROP INDEX IF EXISTS ix_ai_job_task_id"))
+
+
+MIGRATIONS = [
+    Migration(1, 'daily_task difficulty and created_at columns', _up_daily_task_columns, _down_daily_task_columns),
+    Migration(2, 'hot path indexes and unique daily task per user and day', _up_hot_path_indexes,
+              _down_hot_path_indexes),
+    Migration(3, 'user_progress streak columns', _up_progress_streaks, _down_progress_streaks),
+    Migration(4, 'day indexes for analytics rollups', _up_analytics_indexes, _down_analytics_indexes),
+    Migration(5, 'user password_hash widened to 256 characters', _up_password_hash_length,
+              _down_password_hash_length),
+    Migration(6, 'ai_job task_id index for detaching jobs from deleted tasks', _up_ai_job_task_index,
+              _down_ai_job_task_index),
+]
+
+# Queries that run on (nearly) every request, with representative parameters
+HOT_QUERIES = {
+    'daily task for today': (
+        "SELECT id FROM daily_task WHERE user_id = :user_id AND task_date = :today",
+        {'user_id': 1, 'today': '2024-01-01'}
+    ),
+    'progress window': (
+        "SELECT COUNT(id) FROM daily_task WHERE user_id = :user_id AND task_date >= :since",
+        {'user_id': 1, 'since': '2024-01-01'}
+    ),
+    'leaderboard': (
+        'SELECT id, name, score FROM "user" ORDER BY score DESC LIMIT 5',
+        {}
+    ),
+    'users above score': (
+        'SELECT COUNT(*) FROM "user" WHERE score > :score',
+        {'score': 100}
+    ),
+    'followers': (
+        "SELECT user_id FROM connections WHERE friend_id = :user_id",
+        {'user_id': 1}
+    ),
+}
+
+
+def _ensure_version_table(conn):
+    _version_table.create(conn, checkfirst=True)
+
+
+def applied_versions(engine) -> List[int]:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return [version for (version,) in conn.execute(text(f"SELECT version FROM {VERSION_TABLE} ORDER BY version"))]
+
+
+def current_version(engine) -> int:
+    versions = applied_versions(engine)
+    return versions[-1] if versions else 0
+
+
+def upgrade(engine, target: Optional[int] = None, log: Callable[[str], None] = print) -> List[int]:
+    """Apply pending migrations up to ``target`` (default: latest), one transaction each."""
+    done = set(applied_versions(engine))
+    ran = []
+    for migration in MIGRATIONS:
+        if migration.version in done or (target is not None and migration.version > target):
+            continue
+        log(f"applying {migration.version}: {migration.name}")
+        with engine.begin() as conn:
+            migration.up(conn)
+            conn.execute(text(f"INSERT INTO {VERSION_TABLE} (version, name, applied_at) "
+                              f"VALUES (:version, :name, :applied_at)"),
+                         {'version': migration.version, 'name': migration.name, 'applied_at': datetime.utcnow()})
+        ran.append(migration.version)
+    return ran
+
+
+def missing_tables(engine, metadata) -> List[str]:
+    existing = set(inspect(engine).get_table_names())
+    return [name for name in metadata.tables if name not in existing]
+
+
+def upgrade_schema(engine, metadata, target: Optional[int] = None,
+                   log: Callable[[str], None] = print) -> List[int]:
+    """Create the tables in ``metadata`` that don't exist yet, then ``upgrade()``."""
+    missing = missing_tables(engine, metadata)
+    if missing:
+        log(f"creating tables: {', '.join(missing)}")
+        metadata.create_all(engine)
+    return upgrade(engine, target, log)
+
+
+def downgrade(engine, target: int, log: Callable[[str], None] = print) -> List[int]:
+    """Revert applied migrations newer than ``target``, newest first."""
+    done = set(applied_versions(engine))
+    ran = []
+    for migration in reversed(MIGRATIONS):
+        if migration.version not in done or migration.version <= target:
+            continue
+        log(f"reverting {migration.version}: {migration.name}")
+        with engine.begin() as conn:
+            migration.down(conn)
+            conn.execute(text(f"DELETE FROM {VERSION_TABLE} WHERE version = :version"),
+                         {'version': migration.version})
+        ran.append(migration.version)
+    return ran
+
+
+def explain_hot_queries(engine) -> Dict[str, List[str]]:
+    """Return the query plan of each ``HOT_QUERIES`` entry, one string per plan row."""
+    prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    plans = {}
+    with engine.connect() as conn:
+        for label, (sql, params) in HOT_QUERIES.items():
+            rows = conn.execute(text(prefix + sql), params).all()
+            # SQLite rows are (id, parent, notused, detail); other backends return one text column
+            plans[label] = [str(row[-1]) for row in rows]
+    return plans
@@ -1,5 +1,4 @@
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 import string
 import random
 from datetime import datetime
@@ -10,7 +9,8 @@ from connectapp.extensions import db
 connections = db.Table('connections',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
     db.Column('friend_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('connected_on', db.Date, default=date.today)
+    db.Column('connected_on', db.Date, default=date.today),
+    db.Index('ix_connections_friend_id', 'friend_id')  # reverse lookups ("who added me")
 )
 
 class User(UserMixin, db.Model):
@@ -19,10 +19,10 @@ class User(UserMixin, db.Model):
     name = db.Column(db.String(100), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     referral_code = db.Column(db.String(8), unique=True, nullable=False)
     profile_pic = db.Column(db.String(200), default='default.jpg')
-    score = db.Column(db.Integer, default=0)
+    score = db.Column(db.Integer, default=0, index=True)
     tasks = db.relationship('DailyTask', backref='user', lazy=True)
     
 
@@ -36,18 +36,49 @@ class User(UserMixin, db.Model):
                              lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from connectapp.utils.auth_utils import password_hasher
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify ``password``; an outdated hash is upgraded in place (caller commits)."""
+        from connectapp.utils.auth_utils import password_hasher
+        if not password_hasher.verify(self.password_hash, password):
+            return False
+        upgraded = password_hasher.upgrade(self.password_hash, password)
+        if upgraded:
+            self.password_hash = upgraded
+        return True
 
     def add_friend(self, friend):
-        if not self.is_friend(friend):
+        from connectapp.utils.graph_utils import connection_graph
+        if not self.is_connected(friend):
             self.friends.append(friend)
             friend.friends.append(self) # Make the connection mutual
+            # Patched into the adjacency index once the session commits
+            session = db.session()
+            connection_graph.add_pending_edge(session, self.id, friend.id)
+            connection_graph.add_pending_edge(session, friend.id, self.id)
 
     def is_friend(self, friend):
-        return self.friends.filter(connections.c.friend_id == friend.id).count() > 0
+        from connectapp.utils.graph_utils import connection_graph
+        return connection_graph.are_friends(self.id, friend.id) or \
+            connection_graph.has_pending_edge(db.session(), self.id, friend.id)
+
+    def is_connected(self, friend):
+        """
+        Check ``connections`` itself (by primary key, either direction) rather
+        than the per-process graph cache, which can lag behind other workers;
+        use this before writing an edge.
+        """
+        return db.session.query(db.exists().where(db.or_(
+            db.and_(connections.c.user_id == self.id, connections.c.friend_id == friend.id),
+            db.and_(connections.c.user_id == friend.id, connections.c.friend_id == self.id)
+        ))).scalar()
+
+    @property
+    def friend_count(self):
+        from connectapp.utils.graph_utils import connection_graph
+        return connection_graph.friend_count(self.id)
 
     @staticmethod
     def generate_referral_code():
@@ -57,6 +88,23 @@ class User(UserMixin, db.Model):
             if not User.query.filter_by(referral_code=code).first():
                 return code
 
+    @staticmethod
+    def allocate_referral_codes(count):
+        """
+        Generates ``count`` unique referral codes for a bulk insert.
+
+        Candidates are checked against the table with one IN query per
+        round; only collisions are regenerated.
+        """
+        alphabet = string.ascii_uppercase + string.digits
+        codes = set()
+        while len(codes) < count:
+            candidates = {''.join(random.choices(alphabet, k=8)) for _ in range(count - len(codes))} - codes
+            taken = {code for (code,) in db.session.query(User.referral_code)
+                     .filter(User.referral_code.in_(candidates))}
+            codes |= candidates - taken
+        return list(codes)
+
     def __repr__(self):
         return f'<User {self.name}>'
 
@@ -72,12 +120,139 @@ class DailyTask(db.Model):
     simplified_count = db.Column(db.Integer, default=0)  # how many times simplified this week
     xp_points = db.Column(db.Integer, default=10)
 
+    __table_args__ = (
+        # One task per user per day; also serves the (user_id, task_date) lookups
+        db.Index('ix_daily_task_user_date', 'user_id', 'task_date', unique=True),
+        # Day-range scans (analytics rollups) without touching every user's rows
+        db.Index('ix_daily_task_date', 'task_date'),
+    )
+
+
+class DailyTaskArchive(db.Model):
+    """
+    Append-only, compressed chunk of one user's archived daily tasks
+    (zlib-compressed JSON list of the task rows; see ``retention_utils``).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    first_day = db.Column(db.Date, nullable=False)
+    last_day = db.Column(db.Date, nullable=False)
+    task_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (db.Index('ix_daily_task_archive_user_day', 'user_id', 'first_day'),)
+
+
+class UserProgress(db.Model):
+    """Rolling 30-day task summary per user, kept up to date as tasks change."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    window_start = db.Column(db.Date, nullable=False)  # first day counted
+    computed_on = db.Column(db.Date, nullable=False)  # day the window was last rebuilt
+    total_count = db.Column(db.Integer, default=0, nullable=False)
+    completed_count = db.Column(db.Integer, default=0, nullable=False)
+    recent_tasks = db.Column(db.Text, default='[]')  # JSON list of the last few completed task texts
+    current_streak = db.Column(db.Integer, default=0, nullable=False)  # consecutive days ending on last_completed_on
+    best_streak = db.Column(db.Integer, default=0, nullable=False)
+    last_completed_on = db.Column(db.Date, nullable=True)  # latest task_date with a completed task
+
+
+class AIJob(db.Model):
+    """A background AI request (suggestion or simplification) and its result."""
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, safe to expose in URLs
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('daily_task.id'), nullable=True, index=True)  # detached before the task is deleted
+    kind = db.Column(db.String(20), nullable=False)  # "suggestion", "simplify"
+    status = db.Column(db.String(20), default='pending', nullable=False)  # "pending", "running", "done", "failed"
+    input_text = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'result': self.result,
+            'task_id': self.task_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class FriendSuggestion(db.Model):
+    """Precomputed "people you may know" entry: a friend-of-friend and how many friends they share."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    mutual_count = db.Column(db.Integer, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index('ix_friend_suggestion_user_rank', 'user_id', 'rank'),)
+
+
+class InventoryTask(db.Model):
+    """A pre-generated challenge in the shared pool; each one is claimed by at most one user."""
+    id = db.Column(db.Integer, primary_key=True)
+    difficulty = db.Column(db.String(20), nullable=False)
+    task_text = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+    # Serves both "next available task at this difficulty" and the low-water count
+    __table_args__ = (db.Index('ix_inventory_task_available', 'difficulty', 'claimed_by', 'id'),)
+
+
+class ScoreEvent(db.Model):
+    """
+    One score award in the append-only ledger; ``User.score`` is the sum of
+    applied events (plus whatever score predates the ledger).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(20), nullable=False)  # "referral", "task", ...
+    ref_id = db.Column(db.Integer, nullable=True)  # what the award was for (the friend, the task, ...)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=True)  # set once folded into User.score
+
+    __table_args__ = (
+        # The same thing can't be awarded twice; events without a ref_id are not deduplicated
+        db.Index('ix_score_event_award', 'user_id', 'reason', 'ref_id', unique=True),
+        # Serves the aggregator's "oldest unapplied events" scan
+        db.Index('ix_score_event_pending', 'applied_at', 'id'),
+    )
+
+
+class DailyRollup(db.Model):
+    """Analytics summary of one finished day (one row per day, zeros included)."""
+    day = db.Column(db.Date, primary_key=True)
+    tasks = db.Column(db.Integer, default=0, nullable=False)  # also the number of active users: one task per user and day
+    completed = db.Column(db.Integer, default=0, nullable=False)
+    simplified_tasks = db.Column(db.Integer, default=0, nullable=False)  # tasks simplified at least once
+    simplifications = db.Column(db.Integer, default=0, nullable=False)
+    xp_awarded = db.Column(db.Integer, default=0, nullable=False)
+    referrals = db.Column(db.Integer, default=0, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class DailyDifficultyRollup(db.Model):
+    """The task columns of ``DailyRollup`` split by difficulty (only difficulties seen that day)."""
+    day = db.Column(db.Date, primary_key=True)
+    difficulty = db.Column(db.String(20), primary_key=True)
+    tasks = db.Column(db.Integer, default=0, nullable=False)
+    completed = db.Column(db.Integer, default=0, nullable=False)
+    simplified_tasks = db.Column(db.Integer, default=0, nullable=False)
+    simplifications = db.Column(db.Integer, default=0, nullable=False)
+    xp_awarded = db.Column(db.Integer, default=0, nullable=False)
+
 
 class ReferralHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     referrer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable = False)
     referred_id = db.Column(db.Integer, db.ForeignKey('user.id') , nullable = False)
-    date = db.Column(db.DateTime, default=datetime.utcnow)
+    date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     
     referrer = db.relationship('User', foreign_keys=[referrer_id], backref='referrals_made')
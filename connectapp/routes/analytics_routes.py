@@ -0,0 +1,51 @@
+import hmac
+from datetime import date
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from connectapp.utils.analytics_utils import EXPORTS, export
+
+analytics_bp = Blueprint('analytics', __name__)
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _day_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f'{name} must be a YYYY-MM-DD date')
+
+
+@analytics_bp.route('/api/analytics/export')
+def analytics_export():
+    """
+    Stream the daily analytics rollups (``flask rollup-analytics``) as NDJSON or CSV.
+
+    Query args: table (daily or difficulty), format (ndjson or csv), since
+    and until (inclusive days). Disabled unless ``ANALYTICS_TOKEN`` is set;
+    callers send it as ``Authorization: Bearer <token>``.
+    """
+    token = current_app.config['ANALYTICS_TOKEN']
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+
+    table = request.args.get('table', 'daily')
+    fmt = request.args.get('format', 'ndjson')
+    if table not in EXPORTS or fmt not in MIMETYPES:
+        return jsonify({
+            'success': False,
+            'error': f"table must be one of {', '.join(EXPORTS)} and format one of {', '.join(MIMETYPES)}"
+        }), 400
+    since, until = _day_arg('since'), _day_arg('until')
+
+    response = Response(stream_with_context(export(table, fmt, since, until)), mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=connectapp-{table}.{fmt}'
+    return response
@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from connectapp.models import User
 from connectapp.extensions import db
+from connectapp.utils.leaderboard_utils import leaderboard
+from connectapp.utils.auth_utils import HasherBusyError
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -17,7 +19,13 @@ def login():
         email = request.form['email']
         password = request.form['password']
         user = User.query.filter_by(email=email).first()
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except HasherBusyError:
+            flash('⏳ We are very busy right now. Please try again in a moment.', 'warning')
+            return render_template('login.html'), 503
+        if valid:
+            db.session.commit()  # persists an upgraded password hash, if any
             login_user(user)
             flash(f'🎉 Welcome back, {user.name}! 🎉', 'success')
             return redirect(url_for('dashboard.dashboard'))
@@ -46,9 +54,14 @@ def register():
             flash('⚠️ Email already registered. Please use a different email.', 'warning')
             return redirect(url_for('auth.register'))
         user = User(name=name, age=age, email=email, referral_code=User.generate_referral_code())
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except HasherBusyError:
+            flash('⏳ We are very busy right now. Please try again in a moment.', 'warning')
+            return render_template('register.html'), 503
         db.session.add(user)
         db.session.commit()
+        leaderboard.record_new_user(user.score)
         flash('🎊 Registration successful! Welcome to ConnectApp! 🎊 Please log in to continue.', 'success')
         return redirect(url_for('auth.login'))
     return render_template('register.html')
@@ -1,18 +1,32 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from connectapp.models import User, DailyTask
+from connectapp.models import AIJob, User, DailyTask, ReferralHistory
 from connectapp.extensions import db
-from connectapp.utils.gemini_utils import generate_daily_task
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from connectapp.utils.task_provider_utils import get_task_provider
+from connectapp.utils.leaderboard_utils import leaderboard
+from connectapp.utils.cache_utils import ai_cache
+from connectapp.utils.job_utils import JobFailed, job_queue
+from connectapp.utils.metrics_utils import metrics
+from connectapp.utils.prompt_utils import prompt_builder
+from connectapp.utils.score_utils import score_ledger, REFERRAL_POINTS
+from connectapp.utils.completion_utils import CompletionConflict, complete_tasks, MAX_BULK_TASKS
+from connectapp.utils.suggestion_utils import refresh_after_connection
+from connectapp.utils.progress_utils import get_user_progress, record_task_created, record_task_deleted, save_rebuilt_progress
 from datetime import date, datetime, timedelta
 
 
 def get_today_task(user):
     today = date.today()
+    # Normally pre-generated by `flask pregenerate-tasks`, so this is a plain read
     task = DailyTask.query.filter_by(user_id=user.id, task_date=today).first()
     if not task:
-        # Generate AI-powered task using Gemini
-        user_progress = _get_user_progress(user)
-        task_data = generate_daily_task(user_progress)
+        # Fallback: generate the task inline with the configured provider
+        provider = get_task_provider()
+        user_progress = get_user_progress(user)
+        save_rebuilt_progress()  # don't hold a rebuilt progress row open across generation
+        task_data = provider.generate(user_progress)
         
         # Create new task with AI-generated content
         task = DailyTask(
@@ -22,8 +36,16 @@ def get_today_task(user):
             task_date=today,
             created_at=datetime.utcnow()
         )
-        db.session.add(task)
-        db.session.commit()
+        try:
+            db.session.add(task)
+            record_task_created(task)
+            db.session.commit()
+        except IntegrityError:
+            # Pre-generation (or a parallel request) stored today's task first
+            db.session.rollback()
+            task = DailyTask.query.filter_by(user_id=user.id, task_date=today).first()
+        else:
+            provider.task_created(task)
     return task
 
 
@@ -32,47 +54,44 @@ dashboard_bp = Blueprint('dashboard', __name__)
 @dashboard_bp.route('/dashboard', methods=['GET', 'POST'])
 @login_required
 def dashboard():
-    users = User.query.order_by(User.score.desc()).all()
+    users = leaderboard.top()
+    my_rank = leaderboard.rank_of(current_user)
     task = get_today_task(current_user)
     suggestion = "Try your best and make a connection today!"
     time_remaining = (datetime.combine(date.today()+timedelta(days=1), datetime.min.time()) - datetime.now()).seconds
-    ai_suggestion = None
-    simplified_task = None
+    pending_job = None
 
     if request.method == 'POST':
         if 'ai_suggest' in request.form:
-            # Generate AI suggestion using Gemini
-            try:
-                user_progress = _get_user_progress(current_user)
-                ai_suggestion_data = _generate_ai_suggestion(task.task_text, user_progress)
-                ai_suggestion = ai_suggestion_data
-            except Exception as e:
-                ai_suggestion = "Here's a tip: Start with a warm smile and genuine interest in the other person!"
+            # Answered in the background; the page polls /api/jobs/<id> for the result
+            pending_job = job_queue.submit('suggestion', current_user.id, task.id, task.task_text)
         elif 'simplify_task' in request.form:
-            # Generate a simplified version of the task
-            try:
-                simplified_task_data = _generate_simplified_task(task.task_text, current_user)
-                simplified_task = simplified_task_data
-                # Update the task in database to mark as simplified
-                task.simplified_count += 1
-                task.task_text = simplified_task_data
-                db.session.commit()
-                # Refresh the task object to get the updated data
-                db.session.refresh(task)
-                flash('✨ Task simplified successfully! ✨', 'info')
-            except Exception as e:
-                simplified_task = "Say hello and exchange smiles with someone."
-                flash('✨ Task simplified', 'info')
+            # The job rewrites the task text once Gemini answers
+            pending_job = job_queue.submit('simplify', current_user.id, task.id, task.task_text)
         elif 'referral_code' in request.form:
             ref_code = request.form['referral_code'].strip()
             if ref_code and ref_code != current_user.referral_code:
                 friend = User.query.filter_by(referral_code=ref_code).first()
-                if friend and not current_user.is_friend(friend):
-                    current_user.add_friend(friend)
-                    current_user.score += 20
-                    friend.score += 20
-                    db.session.commit()
-                    flash(f'🎉 Connection established with {friend.name}! 🎉 (+20pts each) 🚀', 'success')
+                connected = False
+                if friend and not current_user.is_connected(friend):
+                    try:
+                        current_user.add_friend(friend)
+                        db.session.add(ReferralHistory(referrer_id=friend.id, referred_id=current_user.id))
+                        # Ledger inserts only; the aggregator folds them into User.score (and the leaderboard)
+                        score_ledger.award(current_user.id, REFERRAL_POINTS, 'referral', ref_id=friend.id)
+                        score_ledger.award(friend.id, REFERRAL_POINTS, 'referral', ref_id=current_user.id)
+                        db.session.commit()
+                        connected = True
+                    except IntegrityError:
+                        # The same referral was submitted concurrently and committed first
+                        db.session.rollback()
+                if connected:
+                    try:
+                        refresh_after_connection(current_user.id, friend.id)
+                    except Exception:
+                        # Suggestions are advisory; the nightly refresh will catch up
+                        db.session.rollback()
+                    flash(f'🎉 Connection established with {friend.name}! 🎉 (+{REFERRAL_POINTS}pts each) 🚀', 'success')
                 elif friend:
                     flash('🤝 Already connected with this user.', 'info')
                 else:
@@ -80,22 +99,72 @@ def dashboard():
             else:
                 flash('⚠️ Invalid referral code.', 'danger')
             return redirect(url_for('dashboard.dashboard'))
-    return render_template('dashboard.html', users=users, task=task, time_remaining=time_remaining, suggestion=suggestion, ai_suggestion=ai_suggestion, simplified_task=simplified_task)
+    return render_template('dashboard.html', users=users, my_rank=my_rank, task=task, time_remaining=time_remaining, suggestion=suggestion, pending_job=pending_job)
+
+
+@dashboard_bp.route('/api/leaderboard')
+@login_required
+def api_leaderboard():
+    """Paginated leaderboard as JSON, plus the caller's own rank."""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    data = leaderboard.page(page, per_page)
+    data['my_rank'] = leaderboard.rank_of(current_user)
+    return jsonify(data), 200
+
+
+@dashboard_bp.route('/api/jobs/<job_id>')
+@login_required
+def api_job(job_id):
+    """Poll a background AI job started from the dashboard."""
+    job = job_queue.get(job_id, current_user.id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    }), 200
+
+
+@dashboard_bp.route('/api/gemini/status')
+@login_required
+def api_gemini_status():
+    """Report the shared Gemini client's circuit state and AI response cache counters."""
+    from connectapp.utils.gemini_utils import get_gemini_client
+    try:
+        status = get_gemini_client().status()
+    except ValueError:
+        status = {'circuit': 'unconfigured'}
+    status['cache'] = ai_cache.stats()
+    return jsonify(status), 200
 
 
 @dashboard_bp.route('/api/daily_task', methods=['GET', 'POST'])
 @login_required
 def api_daily_task():
     """API endpoint to generate and serve daily tasks as JSON."""
+    today = date.today()
+    existing_task = DailyTask.query.filter_by(
+        user_id=current_user.id,
+        task_date=today
+    ).first()
+    if existing_task and existing_task.completed:
+        # Replacing it would let the new task be completed (and earn XP) again
+        return _task_completed_response()
+
     try:
         # Get user's progress data
-        user_progress = _get_user_progress(current_user)
+        user_progress = get_user_progress(current_user)
+        save_rebuilt_progress()  # don't hold a rebuilt progress row open across generation
         
-        # Generate new task using Gemini
-        task_data = generate_daily_task(user_progress)
+        # Generate new task with the configured provider
+        provider = get_task_provider()
+        task_data = provider.generate(user_progress)
         
         # Create and save the task to database
-        today = date.today()
         new_task = DailyTask(
             user_id=current_user.id,
             task_text=task_data['task_text'],
@@ -105,16 +174,20 @@ def api_daily_task():
         )
         
         # Remove any existing task for today if it exists
-        existing_task = DailyTask.query.filter_by(
-            user_id=current_user.id, 
-            task_date=today
-        ).first()
-        
         if existing_task:
-            db.session.delete(existing_task)
+            record_task_deleted(existing_task)
+            # Jobs outlive the task they were about; the foreign key would otherwise reject the delete
+            db.session.execute(update(AIJob).where(AIJob.task_id == existing_task.id).values(task_id=None))
+            # Conditional: the task may have been completed while the new one was generated
+            deleted = DailyTask.query.filter_by(id=existing_task.id, completed=False).delete()
+            if not deleted:
+                db.session.rollback()
+                return _task_completed_response()
         
         db.session.add(new_task)
+        record_task_created(new_task)
         db.session.commit()
+        provider.task_created(new_task)
         
         # Return JSON response
         return jsonify({
@@ -137,123 +210,166 @@ def api_daily_task():
         }), 500
 
 
-def _get_user_progress(user):
-    """Extract user progress data for Gemini API."""
-    # Get completed tasks from the last 30 days
-    thirty_days_ago = date.today() - timedelta(days=30)
-    completed_tasks = DailyTask.query.filter(
-        DailyTask.user_id == user.id,
-        DailyTask.completed == True,
-        DailyTask.task_date >= thirty_days_ago
-    ).all()
-    
-    # Calculate success rate
-    total_tasks = DailyTask.query.filter(
-        DailyTask.user_id == user.id,
-        DailyTask.task_date >= thirty_days_ago
-    ).count()
-    
-    success_rate = len(completed_tasks) / total_tasks if total_tasks > 0 else 0.5
-    
-    # Get recent activities (completed tasks)
-    recent_activities = [task.task_text for task in completed_tasks[-5:]]
-    
-    # Determine difficulty preference based on user's history
-    difficulty_preference = 'medium'  # Default
-    if success_rate > 0.8:
-        difficulty_preference = 'hard'
-    elif success_rate < 0.3:
-        difficulty_preference = 'easy'
-    
-    return {
-        'completed_tasks': [task.task_text for task in completed_tasks],
-        'difficulty_preference': difficulty_preference,
-        'recent_activities': recent_activities,
-        'success_rate': success_rate,
-        'user_score': user.score
-    }
+def _task_completed_response():
+    return jsonify({
+        'success': False,
+        'error': "Today's task is already completed"
+    }), 409
 
 
-def _generate_ai_suggestion(task_text, user_progress):
-    """Generate AI-powered suggestions for completing a task."""
+def _completion_conflict_response():
+    return jsonify({
+        'success': False,
+        'error': 'These tasks are being completed by another request; please retry'
+    }), 409
+
+
+def _completion_response(result):
+    progress = get_user_progress(current_user)
+    save_rebuilt_progress()
+    result.update({
+        'success': True,
+        'current_streak': progress['current_streak'],
+        'best_streak': progress['best_streak'],
+        'success_rate': progress['success_rate']
+    })
+    return jsonify(result), 200
+
+
+@dashboard_bp.route('/api/tasks/<int:task_id>/complete', methods=['POST'])
+@login_required
+def api_complete_task(task_id):
+    """Mark one of the caller's tasks completed; repeating the call is harmless."""
     try:
-        from connectapp.utils.gemini_utils import GeminiAPI
-        gemini = GeminiAPI()
-        
-        # Create a prompt for generating suggestions
-        prompt = f"""
-You are a social connection coach helping someone complete this daily challenge:
+        result = complete_tasks(current_user.id, [task_id])
+    except CompletionConflict:
+        return _completion_conflict_response()
+    if result['not_found']:
+        return jsonify({
+            'success': False,
+            'error': 'Task not found'
+        }), 404
+    if result['not_due']:
+        return jsonify({
+            'success': False,
+            'error': 'Task is not due yet'
+        }), 409
+    return _completion_response(result)
 
-TASK: "{task_text}"
 
-User's recent progress:
-- Completed tasks: {len(user_progress.get('completed_tasks', []))} recent tasks
-- Success rate: {user_progress.get('success_rate', 0.5):.1%}
-- Difficulty preference: {user_progress.get('difficulty_preference', 'medium')}
+@dashboard_bp.route('/api/tasks/complete', methods=['POST'])
+@login_required
+def api_complete_tasks():
+    """Bulk completion: ``{"task_ids": [...]}``; reports per-id outcomes instead of failing the batch."""
+    data = request.get_json(silent=True) or {}
+    task_ids = data.get('task_ids')
+    if not isinstance(task_ids, list) or not task_ids or \
+            not all(isinstance(task_id, int) and not isinstance(task_id, bool) for task_id in task_ids):
+        return jsonify({
+            'success': False,
+            'error': 'task_ids must be a non-empty list of task ids'
+        }), 400
+    if len(task_ids) > MAX_BULK_TASKS:
+        return jsonify({
+            'success': False,
+            'error': f'At most {MAX_BULK_TASKS} tasks per request'
+        }), 400
+    try:
+        result = complete_tasks(current_user.id, task_ids)
+    except CompletionConflict:
+        return _completion_conflict_response()
+    return _completion_response(result)
 
-Generate ONE specific, actionable suggestion to help them complete this task successfully. Make it encouraging and practical.
 
-Requirements:
-- Be specific and actionable (not vague)
-- Focus on practical steps they can take
-- Be encouraging and positive
-- Keep it to 1-2 sentences maximum
-- Make it relevant to the specific task
+def _generate_ai_suggestion(task_text, user_progress):
+    """Generate AI-powered suggestions for completing a task."""
+    # Success rate is bucketed to 10% so similar users share cache entries
+    cache_key = ai_cache.make_key(
+        'suggestion',
+        task_text,
+        round(user_progress.get('success_rate', 0.5), 1),
+        user_progress.get('difficulty_preference', 'medium')
+    )
+    cached = ai_cache.get(cache_key)
+    if cached:
+        return cached
 
-Respond with ONLY the suggestion text, no additional formatting.
-"""
+    try:
+        from connectapp.utils.gemini_utils import get_gemini_client
+        gemini = get_gemini_client()
         
-        response = gemini.model.generate_content(prompt)
-        suggestion = response.text.strip()
+        prompt = prompt_builder.suggestion(task_text, user_progress)
+        suggestion = gemini.generate(prompt, kind='suggestion').strip()
         
         # Clean up the response
         if suggestion.startswith('"') and suggestion.endswith('"'):
             suggestion = suggestion[1:-1]
         
-        return suggestion if suggestion and len(suggestion) > 10 else "Start with a warm smile and genuine interest in the other person!"
+        if suggestion and len(suggestion) > 10:
+            ai_cache.set(cache_key, suggestion)
+            return suggestion
+        metrics.record_fallback('suggestion')
+        return "Start with a warm smile and genuine interest in the other person!"
         
     except Exception as e:
+        metrics.record_fallback('suggestion')
         return "Here's a tip: Start with a warm smile and genuine interest in the other person!"
 
 
 def _generate_simplified_task(original_task, user):
-    """Generate a simplified version of the current task."""
-    try:
-        from connectapp.utils.gemini_utils import GeminiAPI
-        gemini = GeminiAPI()
-        
-        # Create a prompt for generating simplified tasks
-        prompt = f"""
-You are a social connection coach. The user is struggling with this task:
-
-ORIGINAL TASK: "{original_task}"
-
-Generate a SIMPLIFIED version of this task that is easier to complete but still builds social connections.
+    """Generate a simplified version of the current task; None when Gemini gave no usable answer."""
+    cache_key = ai_cache.make_key('simplify', original_task)
+    cached = ai_cache.get(cache_key)
+    if cached:
+        return cached
 
-Requirements:
-- Make it significantly easier than the original
-- Keep the same social connection goal
-- Be specific and actionable
-- Make it achievable for someone who might be shy or nervous
-- Keep it to 1-2 sentences maximum
-- Focus on low-pressure social interactions
-
-Examples of simplified tasks:
-- "Say hello and smile at one person today"
-- "Make eye contact and nod at someone you pass by"
-- "Ask one person 'How's your day going?'"
-
-Respond with ONLY the simplified task text, no additional formatting.
-"""
+    try:
+        from connectapp.utils.gemini_utils import get_gemini_client
+        gemini = get_gemini_client()
         
-        response = gemini.model.generate_content(prompt)
-        simplified = response.text.strip()
+        prompt = prompt_builder.simplify(original_task)
+        simplified = gemini.generate(prompt, kind='simplify').strip()
         
         # Clean up the response
         if simplified.startswith('"') and simplified.endswith('"'):
             simplified = simplified[1:-1]
         
-        return simplified if simplified and len(simplified) > 10 else "Say hello and exchange smiles with someone."
+        if simplified and len(simplified) > 10:
+            ai_cache.set(cache_key, simplified)
+            return simplified
+        metrics.record_fallback('simplify')
+        return None
         
     except Exception as e:
-        return "Say hello and exchange smiles with someone."
+        metrics.record_fallback('simplify')
+        return None
+
+
+def _run_suggestion_job(job):
+    """Job handler: AI suggestion for the task text captured at submit time."""
+    user_progress = get_user_progress(db.session.get(User, job.user_id))
+    save_rebuilt_progress()  # don't hold a rebuilt progress row open across the Gemini call
+    return _generate_ai_suggestion(job.input_text, user_progress)
+
+
+def _run_simplify_job(job):
+    """Job handler: simplify the task and store the new text on it, if it is still the open task the job was for."""
+    simplified = _generate_simplified_task(job.input_text, None)
+    if simplified is None:
+        raise JobFailed("Gemini gave no simplification")
+    # The call can take seconds; the user may have completed or replaced the task meanwhile
+    updated = db.session.query(DailyTask).filter(
+        DailyTask.id == job.task_id,
+        DailyTask.task_text == job.input_text,
+        DailyTask.completed == False
+    ).update({
+        DailyTask.task_text: simplified,
+        DailyTask.simplified_count: db.func.coalesce(DailyTask.simplified_count, 0) + 1
+    }, synchronize_session=False)
+    if not updated:
+        raise JobFailed("task was completed or replaced")
+    return simplified
+
+
+job_queue.register('suggestion', _run_suggestion_job)
+job_queue.register('simplify', _run_simplify_job)
@@ -0,0 +1,21 @@
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+from connectapp.utils.metrics_utils import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus scrape target: request, SQL and Gemini metrics plus cache gauges.
+
+    Disabled unless ``METRICS_TOKEN`` is set; scrapers send it as
+    ``Authorization: Bearer <token>``.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if not current_app.config['METRICS_ENABLED'] or not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
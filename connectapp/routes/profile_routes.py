@@ -1,18 +1,34 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from connectapp.extensions import db
 from connectapp.models import User
-import os
-from werkzeug.utils import secure_filename
+from connectapp.utils.graph_utils import connection_graph
+from connectapp.utils.image_utils import image_pipeline, InvalidImageError
+from connectapp.utils.suggestion_utils import get_suggestions
 
 profile_bp = Blueprint('profile', __name__)
 
 @profile_bp.route('/connections')
 @login_required
 def connections():
-    friends = current_user.friends.all()
+    # Only the columns the page shows, for the ids already in the adjacency index
+    friend_ids = list(connection_graph.friend_ids(current_user.id))
+    friends = []
+    if friend_ids:
+        friends = db.session.query(User.id, User.name, User.age, User.email) \
+            .filter(User.id.in_(friend_ids)).order_by(User.name).all()
     return render_template('connections.html', friends=friends)
 
+@profile_bp.route('/api/suggestions')
+@login_required
+def api_suggestions():
+    """People you may know: friends of friends ranked by mutual connections."""
+    limit = max(min(request.args.get('limit', 10, type=int), 20), 1)
+    return jsonify({
+        'success': True,
+        'suggestions': get_suggestions(current_user.id, limit)
+    }), 200
+
 @profile_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
@@ -20,11 +36,14 @@ def profile():
         if 'profile_pic' in request.files:
             file = request.files['profile_pic']
             if file and file.filename:
-                filename = secure_filename(f'user_{current_user.id}_{file.filename}')
-                filepath = os.path.join('static/profile_pics', filename)
-                file.save(filepath)
-                current_user.profile_pic = filename
-                db.session.commit()
-                flash('Profile picture updated!', 'success')
+                try:
+                    ready = image_pipeline.submit(current_user.id, file.read())
+                except InvalidImageError:
+                    flash('Please upload a JPEG, PNG, GIF, WebP or BMP image.', 'danger')
+                    return redirect(url_for('profile.profile'))
+                if ready:
+                    flash('Profile picture updated!', 'success')
+                else:
+                    flash('Profile picture uploaded! It will appear in a moment.', 'success')
                 return redirect(url_for('profile.profile'))
     return render_template('profile.html')
@@ -0,0 +1,157 @@
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import and_, case, delete, func, insert, or_
+
+from connectapp.extensions import db
+from connectapp.models import DailyDifficultyRollup, DailyRollup, DailyTask, ReferralHistory
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_CHUNK_DAYS = 31  # days aggregated per query and committed together
+EXPORT_PAGE_SIZE = 500
+
+TASK_COLUMNS = ('tasks', 'completed', 'simplified_tasks', 'simplifications', 'xp_awarded')
+EXPORTS = {
+    'daily': (DailyRollup, ('day',) + TASK_COLUMNS + ('referrals',)),
+    'difficulty': (DailyDifficultyRollup, ('day', 'difficulty') + TASK_COLUMNS),
+}
+
+
+def _task_totals(start: date, end: date) -> Dict:
+    """(day, difficulty) -> task column values for days in [start, end], via the task_date index."""
+    rows = db.session.query(
+        DailyTask.task_date,
+        func.coalesce(DailyTask.difficulty, 'medium'),
+        func.count(DailyTask.id),
+        func.coalesce(func.sum(case((DailyTask.completed == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((DailyTask.simplified_count > 0, 1), else_=0)), 0),
+        func.coalesce(func.sum(DailyTask.simplified_count), 0),
+        func.coalesce(func.sum(case((DailyTask.completed == True, DailyTask.xp_points), else_=0)), 0)
+    ).filter(
+        DailyTask.task_date >= start,
+        DailyTask.task_date <= end
+    ).group_by(DailyTask.task_date, func.coalesce(DailyTask.difficulty, 'medium')).all()
+    return {(row[0], row[1]): dict(zip(TASK_COLUMNS, row[2:])) for row in rows}
+
+
+def _referral_counts(start: date, end: date) -> Dict[date, int]:
+    referral_day = func.date(ReferralHistory.date)
+    rows = db.session.query(referral_day, func.count(ReferralHistory.id)).filter(
+        ReferralHistory.date >= datetime.combine(start, datetime.min.time()),
+        ReferralHistory.date < datetime.combine(end + timedelta(days=1), datetime.min.time())
+    ).group_by(referral_day)
+    # SQLite returns the day as text, other backends as a date
+    return {date.fromisoformat(str(day)): count for day, count in rows}
+
+
+def _rollup_range(start: date, end: date):
+    """Replace the rollup rows for days [start, end] with fresh aggregates; the caller commits."""
+    totals = _task_totals(start, end)
+    referrals = _referral_counts(start, end)
+    now = datetime.utcnow()
+
+    days = []
+    day = start
+    while day <= end:
+        row = {'day': day, 'referrals': referrals.get(day, 0), 'computed_at': now}
+        row.update({column: 0 for column in TASK_COLUMNS})
+        days.append(row)
+        day += timedelta(days=1)
+    by_day = {row['day']: row for row in days}
+    for (day, _), values in totals.items():
+        for column, value in values.items():
+            by_day[day][column] += value
+
+    db.session.execute(delete(DailyDifficultyRollup).where(DailyDifficultyRollup.day.between(start, end)))
+    db.session.execute(delete(DailyRollup).where(DailyRollup.day.between(start, end)))
+    db.session.execute(insert(DailyRollup), days)
+    if totals:
+        db.session.execute(insert(DailyDifficultyRollup), [
+            dict(values, day=day, difficulty=difficulty) for (day, difficulty), values in sorted(totals.items())
+        ])
+
+
+def rollup(through: Optional[date] = None, reroll_days: int = 2,
+           log: Callable[[str], None] = logger.info) -> int:
+    """
+    Aggregate every finished day up to ``through`` (default: yesterday)
+    into ``DailyRollup`` / ``DailyDifficultyRollup``.
+
+    Only days after the last rolled-up one are read from ``daily_task``,
+    ``ROLLUP_CHUNK_DAYS`` at a time by day range. The last ``reroll_days``
+    rolled-up days are recomputed as well, to pick up late completions and
+    simplifications. Returns the number of days written.
+    """
+    through = through or date.today() - timedelta(days=1)
+    last = db.session.query(func.max(DailyRollup.day)).scalar()
+    if last is None:
+        last = db.session.query(func.min(DailyTask.task_date)).scalar()
+        if last is None:
+            return 0
+        start = last
+    else:
+        start = last - timedelta(days=reroll_days - 1) if reroll_days > 0 else last + timedelta(days=1)
+
+    written = 0
+    while start <= through:
+        end = min(start + timedelta(days=ROLLUP_CHUNK_DAYS - 1), through)
+        _rollup_range(start, end)
+        db.session.commit()
+        written += (end - start).days + 1
+        log(f"rolled up {start} .. {end}")
+        start = end + timedelta(days=1)
+    return written
+
+
+def _pages(model, columns, since: Optional[date], until: Optional[date]) -> Iterator[List]:
+    """Yield rollup rows (plain tuples) in key order, ``EXPORT_PAGE_SIZE`` at a time, by keyset paging."""
+    keys = list(model.__table__.primary_key.columns)
+    query = db.session.query(*(getattr(model, column) for column in columns))
+    if since is not None:
+        query = query.filter(model.day >= since)
+    if until is not None:
+        query = query.filter(model.day <= until)
+    last = None
+    while True:
+        page_query = query
+        if last is not None:
+            if len(keys) == 1:
+                page_query = page_query.filter(keys[0] > last[0])
+            else:
+                page_query = page_query.filter(or_(keys[0] > last[0], and_(keys[0] == last[0], keys[1] > last[1])))
+        rows = page_query.order_by(*keys).limit(EXPORT_PAGE_SIZE).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][:len(keys)]  # the key columns come first
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def export(table: str, fmt: str, since: Optional[date] = None, until: Optional[date] = None) -> Iterator[str]:
+    """
+    Stream the ``table`` rollup ('daily' or 'difficulty') as NDJSON lines or
+    CSV (with a header row). Only one page of rows is held at a time.
+    """
+    model, columns = EXPORTS[table]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for rows in _pages(model, columns, since, until):
+            writer.writerows([_value(value) for value in row] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # just the header: there were no rows
+    else:
+        for rows in _pages(model, columns, since, until):
+            yield ''.join(json.dumps(dict(zip(columns, map(_value, row)))) + '\n' for row in rows)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from flask import request
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class AssetManifest:
+    """
+    Content fingerprints for files in the static folder.
+
+    ``url_for('static', filename=...)`` gets a ``v=<hash>`` query argument,
+    so a changed file always gets a new URL. Requests that carry the current
+    hash are served with a year-long immutable ``Cache-Control``; anything
+    else (no hash, or a stale one) must revalidate via ETag and gets a 304
+    when unchanged.
+
+    Entries are keyed by path and checked against the file's mtime/size, so
+    files added or edited at runtime (e.g. profile pictures) are picked up
+    without a restart. ``flask build-assets`` writes the manifest ahead of
+    time so workers start with a warm table.
+    """
+
+    def __init__(self):
+        self.static_folder = None
+        self.manifest_path = None
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.manifest_path = os.path.join(app.instance_path, app.config['ASSET_MANIFEST_FILE'])
+        self.load()
+        app.url_defaults(self._add_version)
+        app.after_request(self._set_cache_headers)
+
+    def load(self):
+        """Load a manifest written by ``build()``; a missing or broken file just means a cold start."""
+        try:
+            with open(self.manifest_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._entries = entries
+
+    def build(self) -> Dict[str, Dict]:
+        """Hash every static file and write the manifest to the instance folder."""
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                relative = os.path.relpath(os.path.join(root, name), self.static_folder)
+                self.version(relative.replace(os.sep, '/'))
+
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+        return self._entries
+
+    def version(self, filename: str) -> Optional[str]:
+        """Short content hash of a static file, or ``None`` if it doesn't exist."""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        entry = self._entries.get(filename)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return entry['hash']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+        entry = {'hash': digest.hexdigest()[:12], 'mtime': stat.st_mtime, 'size': stat.st_size}
+        with self._lock:
+            self._entries[filename] = entry
+        return entry['hash']
+
+    def _add_version(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            version = self.version(values['filename'])
+            if version:
+                values['v'] = version
+
+    def _set_cache_headers(self, response):
+        if request.endpoint != 'static' or response.status_code not in (200, 304):
+            return response
+        requested = request.args.get('v')
+        if requested and requested == self.version(request.view_args.get('filename', '')):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+assets = AssetManifest()
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusyError(RuntimeError):
+    """Raised when the hashing pool is saturated and the caller should retry later."""
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for password hashing and verification.
+
+    Salted hashes are deliberately CPU-heavy; running them in separate
+    processes keeps them off the WSGI threads and lets auth throughput
+    scale with cores. At most ``max_pending`` operations may be queued or
+    running per process; beyond that callers wait up to ``queue_timeout``
+    seconds and then get ``HasherBusyError`` instead of piling up.
+
+    ``method`` is the werkzeug hash spec (e.g. ``scrypt:32768:8:1``); hashes
+    made with any other spec are reported by ``needs_rehash()``.
+    """
+
+    def __init__(self):
+        self.method = 'scrypt:32768:8:1'
+        self.workers = 0
+        self.max_pending = 32
+        self.queue_timeout = 5.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._stats = {'hash': [0, 0.0, 0.0], 'verify': [0, 0.0, 0.0]}  # count, total seconds, max seconds
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def init_app(self, app):
+        """
+        Apply ``PASSWORD_HASH_METHOD``, ``AUTH_HASH_WORKERS`` (0 hashes inline),
+        ``AUTH_HASH_MAX_PENDING`` and ``AUTH_HASH_QUEUE_TIMEOUT``.
+
+        The pool itself is started lazily, so forking WSGI servers create it
+        in each worker rather than sharing one across a fork.
+        """
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['AUTH_HASH_WORKERS']
+        self.max_pending = app.config['AUTH_HASH_MAX_PENDING']
+        self.queue_timeout = app.config['AUTH_HASH_QUEUE_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.shutdown()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _run(self, kind: str, fn, *args):
+        if self.workers <= 0:
+            return self._timed(kind, fn, *args)
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Password hashing pool saturated (%d pending)", self.max_pending)
+            raise HasherBusyError("Too many concurrent password operations")
+        try:
+            with self._lock:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                return self._timed(kind, lambda *a: self._pool().submit(fn, *a).result(), *args)
+            except BrokenProcessPool:
+                logger.exception("Password hashing pool broke; restarting it")
+                self.shutdown()
+                return self._timed(kind, fn, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _timed(self, kind: str, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stat = self._stats[kind]
+                stat[0] += 1
+                stat[1] += elapsed
+                stat[2] = max(stat[2], elapsed)
+
+    def hash(self, password: str) -> str:
+        return self._run('hash', partial(generate_password_hash, method=self.method), password)
+
+    def verify(self, pwhash: Optional[str], password: str) -> bool:
+        if not pwhash:
+            return False
+        return self._run('verify', check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """True if ``pwhash`` was made with different parameters than the current policy."""
+        return pwhash.split('$', 1)[0] != self.method
+
+    def upgrade(self, pwhash: str, password: str) -> Optional[str]:
+        """After a successful verify, return a hash under the current policy if ``pwhash`` is outdated."""
+        if not self.needs_rehash(pwhash):
+            return None
+        new_hash = self.hash(password)
+        with self._lock:
+            self.rehashed += 1
+        return new_hash
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+                **{
+                    f'{kind}_{name}': value
+                    for kind, (count, total, peak) in self._stats.items()
+                    for name, value in (('count', count),
+                                        ('avg_seconds', total / count if count else 0.0),
+                                        ('max_seconds', peak))
+                }
+            }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """
+    SQLite-backed LRU/TTL cache for generated AI text.
+
+    Living in its own database file keeps it out of the app's transactions
+    while still surviving restarts and being shared by every worker process
+    on the host. Each thread keeps its own connection.
+    """
+
+    # Only rewrite last_used on a hit when it is older than this many seconds,
+    # so hot keys don't turn every read into a write.
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 5000, ttl: float = 7 * 24 * 3600):
+        """
+        Args:
+            path: SQLite file to store entries in; ``None`` disables the cache.
+            max_entries: Entries kept before least-recently-used ones are evicted.
+            ttl: Seconds an entry stays valid after it was stored.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+
+    def configure(self, path: Optional[str], max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+
+    @staticmethod
+    def make_key(kind: str, *parts) -> str:
+        """Build a stable key from the prompt inputs (whitespace/case-insensitive text)."""
+        normalized = [' '.join(str(part).lower().split()) for part in parts]
+        raw = '\x1f'.join([kind] + normalized)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_last_used ON response_cache (last_used)")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for ``key``, or ``None`` on a miss or expiry."""
+        if not self.path:
+            return None
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at, last_used FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._count('misses')
+                return None
+            if now - row[2] > self.TOUCH_INTERVAL:
+                conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            self._count('errors')
+            return None
+        self._count('hits')
+        return row[0]
+
+    def set(self, key: str, value: str):
+        """Store ``value`` under ``key`` and evict least-recently-used overflow."""
+        if not self.path:
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                " SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        except sqlite3.Error:
+            self._count('errors')
+
+    def clear(self):
+        if not self.path:
+            return
+        try:
+            self._connection().execute("DELETE FROM response_cache")
+        except sqlite3.Error:
+            self._count('errors')
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process plus the shared entry count."""
+        entries = None
+        if self.path:
+            try:
+                entries = self._connection().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        lookups = self.hits + self.misses
+        return {
+            'enabled': bool(self.path),
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries
+        }
+
+
+ai_cache = ResponseCache()
@@ -0,0 +1,96 @@
+from datetime import date
+from typing import Dict, Iterable
+
+from sqlalchemy.exc import IntegrityError
+
+from connectapp.extensions import db
+from connectapp.models import DailyTask, ScoreEvent
+from connectapp.utils.progress_utils import record_tasks_completed
+from connectapp.utils.score_utils import score_ledger
+
+MAX_BULK_TASKS = 100
+CLAIM_ATTEMPTS = 3
+
+
+class CompletionConflict(Exception):
+    """Another request completed some of the same tasks while this one ran."""
+
+
+def _awarded(user_id: int, task_ids) -> set:
+    if not task_ids:
+        return set()
+    return {ref_id for (ref_id,) in db.session.query(ScoreEvent.ref_id).filter(
+        ScoreEvent.user_id == user_id,
+        ScoreEvent.reason == 'task',
+        ScoreEvent.ref_id.in_(task_ids)
+    )}
+
+
+def _complete(user_id: int, task_ids, today: date) -> Dict:
+    tasks = db.session.query(DailyTask).filter(
+        DailyTask.user_id == user_id,
+        DailyTask.id.in_(task_ids)
+    ).all()
+    found = {task.id: task for task in tasks}
+    done = [task for task in tasks if task.completed]
+    not_due = [task for task in tasks if not task.completed and task.task_date > today]
+    pending = [task for task in tasks if not task.completed and task.task_date <= today]
+    # A task id the ledger already paid for (SQLite reuses the ids of deleted rows) is completed without XP
+    awarded = _awarded(user_id, [task.id for task in pending])
+    earning = [task for task in pending if task.id not in awarded]
+
+    if pending:
+        # Conditional UPDATE: if a concurrent request flipped any of these first, start over
+        claimed = db.session.query(DailyTask).filter(
+            DailyTask.id.in_([task.id for task in pending]),
+            DailyTask.completed == False
+        ).update({DailyTask.completed: True}, synchronize_session=False)
+        if claimed != len(pending):
+            raise CompletionConflict()
+        for task in pending:
+            db.session.expire(task, ['completed'])
+        score_ledger.award_many(user_id, [(task.xp_points or 0, 'task', task.id) for task in earning])
+        record_tasks_completed(user_id, pending)
+
+    return {
+        'completed': [task.id for task in earning],
+        'already_completed': [task.id for task in done] + [task.id for task in pending if task.id in awarded],
+        'not_due': [task.id for task in not_due],
+        'not_found': [task_id for task_id in task_ids if task_id not in found],
+        'xp_awarded': sum(task.xp_points or 0 for task in earning)
+    }
+
+
+def complete_tasks(user_id: int, task_ids: Iterable[int]) -> Dict:
+    """
+    Mark the user's tasks ``task_ids`` completed and award their XP, in one
+    transaction.
+
+    Completing is idempotent: tasks that are already completed are reported
+    as such and earn nothing, and the XP award is unique per task in the
+    score ledger; a task id that was already paid for is completed without
+    earning again and reported as already completed. Whatever the batch
+    size, the work is a fixed handful of statements: two SELECTs, one
+    conditional UPDATE, the ledger insert and the progress/streak update.
+    Future tasks (pre-generated for tomorrow) can't be completed yet.
+
+    Returns:
+        Dict with task id lists completed, already_completed, not_due and
+        not_found, plus xp_awarded.
+
+    Raises:
+        CompletionConflict: concurrent requests kept completing the same
+            tasks for ``CLAIM_ATTEMPTS`` tries.
+    """
+    task_ids = list(dict.fromkeys(task_ids))
+    today = date.today()
+    for attempt in range(CLAIM_ATTEMPTS):
+        try:
+            result = _complete(user_id, task_ids, today)
+            db.session.commit()
+            return result
+        except (CompletionConflict, IntegrityError) as exc:
+            # IntegrityError: a concurrent request's award for one of these tasks landed first
+            db.session.rollback()
+            if attempt == CLAIM_ATTEMPTS - 1:
+                raise CompletionConflict() from exc
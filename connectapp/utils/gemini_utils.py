@@ -1,20 +1,161 @@
 import os
-import google.generativeai as genai
+import random
+import threading
+import time
+import logging
 from datetime import datetime
 from typing import Dict, List, Optional
 import json
 
+from connectapp.utils.metrics_utils import metrics
+from connectapp.utils.prompt_utils import prompt_builder
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Minimal thread-safe circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. After that one trial
+    call is let through (half-open); its outcome closes or re-opens the
+    circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may go to the upstream right now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Gemini circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Gemini circuit opened after %d failures", self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
 class GeminiAPI:
     """Modular Gemini API integration for generating daily social challenges."""
     
-    def __init__(self):
-        """Initialize the Gemini API client."""
+    def __init__(self,
+                 timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize the Gemini API client.
+
+        Args:
+            timeout: Total seconds a single ``generate()`` call may take,
+                retries included (env ``GEMINI_TIMEOUT``, default 8).
+            max_retries: Extra attempts after a failed call
+                (env ``GEMINI_MAX_RETRIES``, default 2).
+            breaker: Circuit breaker shared by all calls on this client.
+        """
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
+        # Imported on first use: the SDK takes longer to import than the rest of the app together
+        import google.generativeai as genai
+
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.timeout = timeout if timeout is not None else float(os.getenv('GEMINI_TIMEOUT', '8'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('GEMINI_MAX_RETRIES', '2'))
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv('GEMINI_BREAKER_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('GEMINI_BREAKER_RESET', '30'))
+        )
+
+    def generate(self, prompt: str, kind: str = 'task') -> str:
+        """
+        Send ``prompt`` to Gemini and return the response text.
+
+        Each attempt gets whatever is left of the overall deadline; failed
+        attempts are retried with jittered exponential backoff. The whole
+        call is timed into the metrics under ``kind``.
+
+        Raises:
+            CircuitOpenError: The upstream is currently considered unhealthy.
+            Exception: The last upstream error once retries or time run out.
+        """
+        if not self.breaker.allow():
+            metrics.observe_llm(kind, 'circuit_open', 0.0)
+            raise CircuitOpenError("Gemini circuit is open")
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError("Gemini deadline exceeded")
+                response = self.model.generate_content(prompt, request_options={'timeout': remaining})
+                text = response.text
+            except Exception:
+                attempt += 1
+                backoff = random.uniform(0, min(2.0, 0.25 * 2 ** attempt))
+                if attempt > self.max_retries or time.monotonic() + backoff >= deadline:
+                    self.breaker.record_failure()
+                    metrics.observe_llm(kind, 'error', time.monotonic() - started)
+                    raise
+                time.sleep(backoff)
+                continue
+            self.breaker.record_success()
+            metrics.observe_llm(kind, 'ok', time.monotonic() - started)
+            return text
+
+    def status(self) -> Dict:
+        """Report the client's circuit state and call settings."""
+        return {
+            'circuit': self.breaker.state,
+            'timeout': self.timeout,
+            'max_retries': self.max_retries
+        }
     
     def generate_daily_task(self, user_progress: Dict) -> Dict:
         """
@@ -22,33 +163,34 @@ class GeminiAPI:
         
         Args:
             user_progress: Dictionary containing user's progress data including:
-                - completed_tasks: List of completed tasks
+                - completed_tasks: List of recently completed tasks
+                - completed_count: Number of tasks completed in the window
                 - difficulty_preference: User's preferred difficulty level
                 - recent_activities: Recent social activities
                 - success_rate: User's completion rate
         
         Returns:
-            Dict with keys: task_text, difficulty, created_at
+            Dict with keys: task_text, difficulty, created_at (plus
+            ``fallback: True`` when a canned task was served instead)
         """
+        # Extract user progress data
+        completed_tasks = user_progress.get('completed_tasks', [])
+        completed_count = user_progress.get('completed_count', len(completed_tasks))
+        difficulty_preference = user_progress.get('difficulty_preference', 'medium')
+        success_rate = user_progress.get('success_rate', 0.5)
+
+        # Determine difficulty level based on user progress
+        difficulty = self._determine_difficulty(difficulty_preference, success_rate, completed_count)
+
         try:
-            # Extract user progress data
-            completed_tasks = user_progress.get('completed_tasks', [])
-            difficulty_preference = user_progress.get('difficulty_preference', 'medium')
-            recent_activities = user_progress.get('recent_activities', [])
-            success_rate = user_progress.get('success_rate', 0.5)
-            
-            # Determine difficulty level based on user progress
-            difficulty = self._determine_difficulty(difficulty_preference, success_rate, completed_tasks)
-            
-            # Create context for the AI prompt
-            context = self._build_context(completed_tasks, recent_activities, difficulty)
-            
-            # Generate the task using Gemini
-            prompt = self._create_prompt(context, difficulty)
-            response = self.model.generate_content(prompt)
+            # Static instructions are cached; only the budgeted user context is built per call
+            prompt = prompt_builder.task(user_progress, difficulty)
+            response_text = self.generate(prompt)
             
             # Parse the response
-            task_data = self._parse_response(response.text, difficulty)
+            task_data = self._parse_response(response_text, difficulty)
+            if task_data.get('fallback'):
+                return task_data
             
             return {
                 'task_text': task_data['task_text'],
@@ -58,78 +200,22 @@ class GeminiAPI:
             
         except Exception as e:
             # Fallback to a default task if Gemini fails
-            return self._get_fallback_task()
+            return self._get_fallback_task(difficulty)
     
-    def _determine_difficulty(self, preference: str, success_rate: float, completed_tasks: List) -> str:
+    def _determine_difficulty(self, preference: str, success_rate: float, completed_count: int) -> str:
         """Determine the appropriate difficulty level based on user progress."""
-        # If user has high success rate and many completed tasks, suggest harder challenges
-        if success_rate > 0.8 and len(completed_tasks) > 10:
-            if preference == 'easy':
-                return 'medium'
-            elif preference == 'medium':
-                return 'hard'
-            else:
-                return 'hard'
-        
-        # If user has low success rate, suggest easier challenges
-        elif success_rate < 0.3:
-            return 'easy'
-        
-        # Otherwise, use their preference
-        return preference if preference in ['easy', 'medium', 'hard'] else 'medium'
-    
-    def _build_context(self, completed_tasks: List, recent_activities: List, difficulty: str) -> str:
-        """Build context string for the AI prompt."""
-        context_parts = []
-        
-        if completed_tasks:
-            context_parts.append(f"User has completed {len(completed_tasks)} tasks recently.")
-            context_parts.append("Recent completed tasks:")
-            for task in completed_tasks[-5:]:  # Last 5 tasks
-                context_parts.append(f"- {task}")
-        
-        if recent_activities:
-            context_parts.append("Recent social activities:")
-            for activity in recent_activities[-3:]:  # Last 3 activities
-                context_parts.append(f"- {activity}")
-        
-        context_parts.append(f"Difficulty level: {difficulty}")
-        
-        return "\n".join(context_parts)
-    
-    def _create_prompt(self, context: str, difficulty: str) -> str:
-        """Create the prompt for Gemini to generate a social challenge."""
-        difficulty_descriptions = {
-            'easy': 'simple, low-pressure social interactions that build confidence',
-            'medium': 'moderate social challenges that require some effort but are achievable',
-            'hard': 'challenging social tasks that push comfort zones and build strong connections'
-        }
-        
-        prompt = f"""
-You are a social connection coach helping users build meaningful relationships through daily challenges.
-
-Context about the user:
-{context}
-
-Generate ONE specific, actionable social challenge for today that is {difficulty_descriptions.get(difficulty, 'moderate')}.
-
-Requirements:
-- Make it specific and actionable (not vague)
-- Focus on building genuine connections with others
-- Be encouraging and positive
-- Keep it to 1-2 sentences maximum
-- Make it something that can be completed in one day
-- Avoid repetitive or generic challenges
-
-Examples of good challenges:
-- "Ask a colleague about their weekend plans and share one of your own"
-- "Compliment someone on their work and ask them about their process"
-- "Start a conversation with someone in line at a coffee shop"
-
-Respond with ONLY the challenge text, no additional formatting or explanation.
-"""
-        return prompt
+        return determine_difficulty(preference, success_rate, completed_count)
     
+    def generate_task_batch(self, difficulty: str, count: int) -> List[str]:
+        """
+        Ask for ``count`` generic challenges at ``difficulty`` in one call.
+
+        Used to stock the shared task inventory; the prompt carries no user
+        data. Raises on upstream errors or when no JSON array comes back.
+        """
+        prompt = prompt_builder.batch(difficulty, count)
+        return parse_task_batch(self.generate(prompt, kind='batch'))
+
     def _parse_response(self, response_text: str, difficulty: str) -> Dict:
         """Parse the Gemini response and extract the task."""
         # Clean up the response
@@ -141,26 +227,88 @@ Respond with ONLY the challenge text, no additional formatting or explanation.
         
         # Ensure it's not empty
         if not task_text or len(task_text) < 10:
-            return self._get_fallback_task()
+            return self._get_fallback_task(difficulty)
         
         return {
             'task_text': task_text,
             'difficulty': difficulty
         }
     
-    def _get_fallback_task(self) -> Dict:
-        """Provide a fallback task if Gemini fails."""
-        fallback_tasks = {
-            'easy': "Say hello and smile at three people today.",
-            'medium': "Start a conversation with someone new and learn one interesting fact about them.",
-            'hard': "Introduce yourself to someone you've never talked to and find a common interest."
-        }
-        
-        return {
-            'task_text': fallback_tasks.get('medium', "Make a genuine connection with someone today."),
-            'difficulty': 'medium',
-            'created_at': datetime.utcnow().isoformat()
-        }
+    def _get_fallback_task(self, difficulty: str = 'medium') -> Dict:
+        """Provide a fallback task at ``difficulty`` if Gemini fails."""
+        return fallback_task(difficulty)
+
+
+FALLBACK_TASKS = {
+    'easy': "Say hello and smile at three people today.",
+    'medium': "Start a conversation with someone new and learn one interesting fact about them.",
+    'hard': "Introduce yourself to someone you've never talked to and find a common interest."
+}
+
+
+def determine_difficulty(preference: str, success_rate: float, completed_count: int) -> str:
+    """Determine the appropriate difficulty level based on user progress."""
+    # If user has high success rate and many completed tasks, suggest harder challenges
+    if success_rate > 0.8 and completed_count > 10:
+        if preference == 'easy':
+            return 'medium'
+        elif preference == 'medium':
+            return 'hard'
+        else:
+            return 'hard'
+
+    # If user has low success rate, suggest easier challenges
+    elif success_rate < 0.3:
+        return 'easy'
+
+    # Otherwise, use their preference
+    return preference if preference in ['easy', 'medium', 'hard'] else 'medium'
+
+
+def parse_task_batch(response_text: str) -> List[str]:
+    """Extract the task texts from a batch response (a JSON array, possibly fenced or padded)."""
+    start, end = response_text.find('['), response_text.rfind(']')
+    if start == -1 or end <= start:
+        raise ValueError("Batch response contains no JSON array")
+    tasks = []
+    for item in json.loads(response_text[start:end + 1]):
+        if isinstance(item, str):
+            text = item.strip().strip('"').strip()
+            if len(text) >= 10:
+                tasks.append(text)
+    return tasks
+
+
+def fallback_task(difficulty: str = 'medium') -> Dict:
+    """Canned task at ``difficulty``, marked ``fallback`` so callers can tell it from a generated one."""
+    metrics.record_fallback('task')
+    if difficulty not in FALLBACK_TASKS:
+        difficulty = 'medium'
+    return {
+        'task_text': FALLBACK_TASKS[difficulty],
+        'difficulty': difficulty,
+        'created_at': datetime.utcnow().isoformat(),
+        'fallback': True
+    }
+
+
+_client: Optional[GeminiAPI] = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> GeminiAPI:
+    """
+    Return the process-wide Gemini client, creating it on first use.
+
+    Raises:
+        ValueError: GEMINI_API_KEY is not set.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeminiAPI()
+    return _client
 
 
 def generate_daily_task(user_progress: Dict) -> Dict:
@@ -174,12 +322,8 @@ def generate_daily_task(user_progress: Dict) -> Dict:
         Dict with task_text, difficulty, and created_at
     """
     try:
-        gemini = GeminiAPI()
+        gemini = get_gemini_client()
         return gemini.generate_daily_task(user_progress)
     except Exception as e:
         # Return fallback task if anything fails
-        return {
-            'task_text': "Make a genuine connection with someone today.",
-            'difficulty': 'medium',
-            'created_at': datetime.utcnow().isoformat()
-        }
+        return fallback_task(user_progress.get('difficulty_preference', 'medium'))
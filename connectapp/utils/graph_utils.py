@@ -0,0 +1,125 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from connectapp.extensions import db
+
+PENDING_KEY = 'connection_graph_pending'
+
+
+class ConnectionGraph:
+    """
+    Process-wide adjacency index over the ``connections`` table.
+
+    Each user's friend ids are loaded on first use into a sorted array, so
+    membership is a binary search and the friend count is a length. Edges
+    added through ``User.add_friend`` are patched in once their transaction
+    commits (and dropped if it rolls back). ``invalidate()`` bumps a version
+    counter that retires every loaded array at once; a TTL bounds how long
+    edges written by other processes take to appear.
+    """
+
+    def __init__(self, max_users: int = 100000, ttl: float = 300.0):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.loads = 0
+        self._adjacency: 'OrderedDict[int, Tuple[int, float, array]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.invalidate()
+
+    def friend_ids(self, user_id: int) -> array:
+        """Sorted friend ids of ``user_id`` (do not mutate the returned array)."""
+        with self._lock:
+            entry = self._adjacency.get(user_id)
+            if entry is not None:
+                version, loaded_at, ids = entry
+                if version == self.version and time.monotonic() - loaded_at <= self.ttl:
+                    self._adjacency.move_to_end(user_id)
+                    self.hits += 1
+                    return ids
+            version = self.version
+
+        from connectapp.models import connections
+        rows = db.session.execute(
+            db.select(connections.c.friend_id)
+            .where(connections.c.user_id == user_id)
+            .order_by(connections.c.friend_id)
+        )
+        ids = array('l', (friend_id for (friend_id,) in rows))
+
+        with self._lock:
+            self.loads += 1
+            self._adjacency[user_id] = (version, time.monotonic(), ids)
+            self._adjacency.move_to_end(user_id)
+            while len(self._adjacency) > self.max_users:
+                self._adjacency.popitem(last=False)
+        return ids
+
+    def are_friends(self, user_id: int, friend_id: int) -> bool:
+        ids = self.friend_ids(user_id)
+        i = bisect_left(ids, friend_id)
+        return i < len(ids) and ids[i] == friend_id
+
+    def friend_count(self, user_id: int) -> int:
+        return len(self.friend_ids(user_id))
+
+    def add_pending_edge(self, session, user_id: int, friend_id: int):
+        """Remember an edge added in ``session``; it is applied on commit."""
+        session.info.setdefault(PENDING_KEY, []).append((user_id, friend_id))
+
+    def has_pending_edge(self, session, user_id: int, friend_id: int) -> bool:
+        return (user_id, friend_id) in session.info.get(PENDING_KEY, ())
+
+    def _apply_edges(self, edges: List[Tuple[int, int]]):
+        with self._lock:
+            for user_id, friend_id in edges:
+                entry = self._adjacency.get(user_id)
+                if entry is None:
+                    continue
+                ids = entry[2]
+                i = bisect_left(ids, friend_id)
+                if i == len(ids) or ids[i] != friend_id:
+                    ids.insert(i, friend_id)
+
+    def invalidate(self, user_id: int = None):
+        """Drop one user's array, or (no argument) retire all of them by bumping the version."""
+        with self._lock:
+            if user_id is None:
+                self.version += 1
+            else:
+                self._adjacency.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            'version': self.version,
+            'users_loaded': len(self._adjacency),
+            'hits': self.hits,
+            'loads': self.loads
+        }
+
+
+connection_graph = ConnectionGraph()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending_edges(session):
+    edges = session.info.pop(PENDING_KEY, None)
+    if edges:
+        connection_graph._apply_edges(edges)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_edges(session):
+    session.info.pop(PENDING_KEY, None)
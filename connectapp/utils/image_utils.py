@@ -0,0 +1,158 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from connectapp.extensions import db
+from connectapp.models import User
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP', 'BMP'}
+
+
+class InvalidImageError(ValueError):
+    """Raised when an upload is not an image we accept."""
+
+
+class ImagePipeline:
+    """
+    Turns profile picture uploads into small, content-addressed variants.
+
+    Every upload is hashed first. If the avatar for that hash already
+    exists, the user simply points at it, so identical uploads share one
+    file and are never decoded twice. Otherwise the bytes are decoded once
+    in a background thread and re-encoded as a bounded avatar (WebP when
+    Pillow supports it, JPEG otherwise).
+    """
+
+    def __init__(self):
+        self.app = None
+        self.folder = None
+        self.avatar_size = 256
+        self.quality = 80
+        self.extension = 'webp' if features.check('webp') else 'jpg'
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def init_app(self, app):
+        self.app = app
+        self.folder = os.path.join(app.static_folder, 'profile_pics')
+        self.avatar_size = app.config['AVATAR_SIZE']
+        self.quality = app.config['AVATAR_QUALITY']
+        workers = app.config['IMAGE_WORKERS']
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image') if workers > 0 else None
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    def filename(self, digest: str) -> str:
+        return f'{digest}.{self.extension}'
+
+    @staticmethod
+    def is_processed(filename: Optional[str]) -> bool:
+        """Whether ``filename`` is one of our content-addressed avatars (not a legacy upload)."""
+        stem, ext = os.path.splitext(filename or '')
+        return len(stem) == 32 and ext in ('.webp', '.jpg')
+
+    def submit(self, user_id: int, data: bytes) -> bool:
+        """
+        Queue ``data`` as ``user_id``'s new profile picture.
+
+        Only the image header is read here, to reject non-images early.
+
+        Returns:
+            True if the picture was already known and applied immediately,
+            False if it was queued for processing.
+
+        Raises:
+            InvalidImageError: The upload is not a supported image.
+        """
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image_format = image.format
+        except (UnidentifiedImageError, OSError):
+            raise InvalidImageError("Upload is not a readable image")
+        if image_format not in ALLOWED_FORMATS:
+            raise InvalidImageError(f"Unsupported image format: {image_format}")
+
+        digest = self.digest(data)
+        avatar = self.filename(digest)
+        if os.path.exists(os.path.join(self.folder, avatar)):
+            self._assign(user_id, avatar)
+            return True
+
+        if self._executor is None:
+            self._process_and_assign(user_id, data, digest)
+        else:
+            self._executor.submit(self._process_in_context, user_id, data, digest)
+        return False
+
+    def _process_in_context(self, user_id: int, data: bytes, digest: str):
+        with self.app.app_context():
+            try:
+                self._process_and_assign(user_id, data, digest)
+            except Exception:
+                logger.exception("Processing profile picture for user %s failed", user_id)
+
+    def _process_and_assign(self, user_id: int, data: bytes, digest: str):
+        self._assign(user_id, self.process(data, digest))
+
+    def _assign(self, user_id: int, filename: str):
+        user = db.session.get(User, user_id)
+        if user is not None:
+            user.profile_pic = filename
+            db.session.commit()
+
+    def process(self, data: bytes, digest: str) -> str:
+        """Decode ``data`` once and write the avatar; returns its filename."""
+        name = self.filename(digest)
+        if os.path.exists(os.path.join(self.folder, name)):
+            return name
+        with Image.open(io.BytesIO(data)) as image:
+            # Let the JPEG decoder scale down while decoding; much cheaper for big photos
+            image.draft('RGB', (self.avatar_size, self.avatar_size))
+            image = ImageOps.exif_transpose(image)
+            image = self._normalize_mode(image)
+            avatar = ImageOps.fit(image, (self.avatar_size, self.avatar_size), Image.LANCZOS)
+        self._write(avatar, name)
+        return name
+
+    def _normalize_mode(self, image: Image.Image) -> Image.Image:
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if self.extension == 'webp' and has_alpha:
+            return image.convert('RGBA')
+        if has_alpha:
+            # JPEG has no alpha channel; flatten onto white
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+    def _write(self, image: Image.Image, filename: str):
+        """Write atomically so other processes never serve a half-written file."""
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if self.extension == 'webp':
+                    image.save(out, 'WEBP', quality=self.quality, method=4)
+                else:
+                    image.save(out, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600; static files must be world-readable
+            os.replace(tmp_path, os.path.join(self.folder, filename))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+image_pipeline = ImagePipeline()
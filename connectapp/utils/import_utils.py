@@ -0,0 +1,116 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from connectapp.extensions import db
+from connectapp.models import User
+from connectapp.utils.auth_utils import password_hasher
+
+REQUIRED_FIELDS = ('name', 'age', 'email', 'password')
+
+
+def read_records(stream, fmt: str) -> Iterator[Dict]:
+    """Yield user records one at a time from a CSV (with header) or NDJSON stream."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _chunks(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _clean(record: Dict) -> Optional[Dict]:
+    """Normalize one record, or return None if it can't be imported."""
+    if any(record.get(field) in (None, '') for field in REQUIRED_FIELDS):
+        return None
+    try:
+        age = int(record['age'])
+    except (TypeError, ValueError):
+        return None
+    return {
+        'name': str(record['name']).strip()[:100],
+        'age': age,
+        'email': str(record['email']).strip()[:100],
+        'password': str(record['password'])
+    }
+
+
+def import_users(records: Iterable[Dict],
+                 chunk_size: int = 500,
+                 workers: Optional[int] = None,
+                 log: Callable[[str], None] = print) -> Dict:
+    """
+    Bulk-create users from an iterable of records.
+
+    Records are consumed chunk by chunk so memory stays bounded. Per chunk:
+    existing emails are found with one ``IN`` query, passwords are hashed
+    across a process pool, referral codes are allocated in one batch and
+    the rows go in with a single executemany ``INSERT`` and one commit.
+    A failed run can be rerun; already imported emails are skipped.
+
+    Returns:
+        Dict with counts: created, skipped_existing, invalid
+    """
+    created = 0
+    skipped = 0
+    invalid = 0
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunks(records, chunk_size):
+            rows = []
+            seen = set()
+            for record in chunk:
+                row = _clean(record)
+                if row is None:
+                    invalid += 1
+                elif row['email'] in seen:
+                    skipped += 1
+                else:
+                    seen.add(row['email'])
+                    rows.append(row)
+
+            existing = {email for (email,) in db.session.query(User.email).filter(User.email.in_(seen))}
+            skipped += sum(1 for row in rows if row['email'] in existing)
+            rows = [row for row in rows if row['email'] not in existing]
+            if not rows:
+                continue
+
+            hashes = pool.map(partial(generate_password_hash, method=password_hasher.method), [row['password'] for row in rows],
+                              chunksize=max(len(rows) // (4 * workers), 1))
+            codes = User.allocate_referral_codes(len(rows))
+
+            db.session.execute(insert(User), [
+                {
+                    'name': row['name'],
+                    'age': row['age'],
+                    'email': row['email'],
+                    'password_hash': password_hash,
+                    'referral_code': code,
+                    'profile_pic': 'default.jpg',
+                    'score': 0
+                }
+                for row, password_hash, code in zip(rows, hashes, codes)
+            ])
+            db.session.commit()
+            created += len(rows)
+            log(f"imported {created} users ({skipped} existing, {invalid} invalid)")
+
+    return {'created': created, 'skipped_existing': skipped, 'invalid': invalid}
@@ -0,0 +1,196 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func, insert, select, update
+
+from connectapp.extensions import db
+from connectapp.models import DailyTask, InventoryTask
+from connectapp.utils.gemini_utils import get_gemini_client
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+CLAIM_CANDIDATES = 8  # concurrent claimers pick among this many rows so they rarely collide
+CLAIM_ATTEMPTS = 3
+REFILL_RETRY_SECONDS = 60
+
+
+class TaskInventory:
+    """
+    Shared pool of pre-generated challenges per difficulty.
+
+    Assigning a task to a user is an indexed claim (``claim()``) instead of
+    an LLM call. The pool is stocked by batched prompts that ask Gemini for
+    many tasks at once; when a difficulty drops below ``low_water``
+    available tasks, a background refill tops it up to ``target``.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.target = 200
+        self.low_water = 50
+        self.batch_size = 25
+        self.repeat_days = 30
+        self.claimed_retention_days = 7
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._refilling = set()
+        self._retry_at: Dict[str, float] = {}
+        self.claims = 0
+        self.misses = 0
+        self.refills = 0
+        self.generated = 0
+        self.upstream_calls = 0
+
+    def init_app(self, app):
+        """Apply ``TASK_INVENTORY_*`` settings; refills run on a single background thread."""
+        self.app = app
+        self.target = app.config['TASK_INVENTORY_TARGET']
+        self.low_water = app.config['TASK_INVENTORY_LOW_WATER']
+        self.batch_size = app.config['TASK_INVENTORY_BATCH']
+        self.repeat_days = app.config['TASK_INVENTORY_REPEAT_DAYS']
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='task-inventory')
+
+    def available(self, difficulty: str) -> int:
+        return db.session.query(func.count(InventoryTask.id)).filter(
+            InventoryTask.difficulty == difficulty,
+            InventoryTask.claimed_by.is_(None)
+        ).scalar()
+
+    def claim(self, user_id: int, difficulty: str) -> Optional[str]:
+        """
+        Take an available task the user hasn't had in ``repeat_days`` days.
+
+        The claim is an UPDATE in the caller's transaction, so it commits or
+        rolls back together with the ``DailyTask`` it becomes. Returns None
+        when the pool has nothing suitable.
+        """
+        seen = select(DailyTask.task_text).where(
+            DailyTask.user_id == user_id,
+            DailyTask.task_date >= date.today() - timedelta(days=self.repeat_days)
+        )
+        task_text = None
+        for _ in range(CLAIM_ATTEMPTS):
+            candidates = db.session.execute(
+                select(InventoryTask.id, InventoryTask.task_text)
+                .where(InventoryTask.difficulty == difficulty,
+                       InventoryTask.claimed_by.is_(None),
+                       InventoryTask.task_text.not_in(seen))
+                .order_by(InventoryTask.id)
+                .limit(CLAIM_CANDIDATES)
+            ).all()
+            if not candidates:
+                break
+            row = random.choice(candidates)
+            claimed = db.session.execute(
+                update(InventoryTask)
+                .where(InventoryTask.id == row.id, InventoryTask.claimed_by.is_(None))
+                .values(claimed_by=user_id, claimed_at=datetime.utcnow())
+            ).rowcount
+            if claimed:
+                task_text = row.task_text
+                break
+
+        with self._lock:
+            if task_text is None:
+                self.misses += 1
+            else:
+                self.claims += 1
+        self.maybe_refill(difficulty)
+        return task_text
+
+    def maybe_refill(self, difficulty: str):
+        """Queue a background refill if ``difficulty`` is below the low-water mark."""
+        if self._executor is None:
+            return
+        with self._lock:
+            if difficulty in self._refilling or time.monotonic() < self._retry_at.get(difficulty, 0):
+                return
+        if self.available(difficulty) >= self.low_water:
+            return
+        with self._lock:
+            if difficulty in self._refilling:
+                return
+            self._refilling.add(difficulty)
+        self._executor.submit(self._refill_in_context, difficulty)
+
+    def _refill_in_context(self, difficulty: str):
+        try:
+            with self.app.app_context():
+                self.refill(difficulty)
+        except Exception:
+            logger.exception("Refilling %s task inventory failed", difficulty)
+            with self._lock:
+                self._retry_at[difficulty] = time.monotonic() + REFILL_RETRY_SECONDS
+        finally:
+            with self._lock:
+                self._refilling.discard(difficulty)
+
+    def refill(self, difficulty: str, target: Optional[int] = None,
+               log: Callable[[str], None] = logger.info) -> int:
+        """
+        Top ``difficulty`` up to ``target`` available tasks with batched
+        Gemini calls, and drop claimed rows past the retention window.
+
+        Returns the number of tasks added.
+        """
+        target = self.target if target is None else target
+        db.session.query(InventoryTask).filter(
+            InventoryTask.claimed_at < datetime.utcnow() - timedelta(days=self.claimed_retention_days)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+        gemini = get_gemini_client()
+        added = 0
+        empty_batches = 0
+        while empty_batches < 2:
+            missing = target - self.available(difficulty)
+            if missing <= 0:
+                break
+            known = {text for (text,) in db.session.query(InventoryTask.task_text).filter(
+                InventoryTask.difficulty == difficulty, InventoryTask.claimed_by.is_(None))}
+            with self._lock:
+                self.upstream_calls += 1
+            texts = []
+            for text in gemini.generate_task_batch(difficulty, min(self.batch_size, missing)):
+                text = text[:255]
+                if text not in known:
+                    known.add(text)
+                    texts.append(text)
+            if not texts:
+                empty_batches += 1  # the model keeps repeating itself; stop rather than spin
+                continue
+            db.session.execute(insert(InventoryTask), [
+                {'difficulty': difficulty, 'task_text': text, 'created_at': datetime.utcnow()} for text in texts
+            ])
+            db.session.commit()
+            added += len(texts)
+            log(f"{difficulty}: +{len(texts)} tasks")
+
+        with self._lock:
+            self.refills += 1
+            self.generated += added
+        return added
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.claims + self.misses
+            return {
+                'claims': self.claims,
+                'misses': self.misses,
+                'hit_rate': self.claims / lookups if lookups else 0.0,
+                'refills': self.refills,
+                'generated': self.generated,
+                'upstream_calls': self.upstream_calls,
+                'refilling': len(self._refilling)
+            }
+
+
+task_inventory = TaskInventory()
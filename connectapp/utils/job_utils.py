@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from connectapp.extensions import db
+from connectapp.models import AIJob
+
+logger = logging.getLogger(__name__)
+
+
+PRUNE_INTERVAL = 3600  # seconds between clean-ups of old jobs, per process
+
+
+class JobFailed(Exception):
+    """Raised by a handler that can't produce a result; the job is marked failed without a traceback."""
+
+
+class JobQueue:
+    """
+    In-process background queue for slow AI actions.
+
+    Job state lives in the ``AIJob`` table so any worker process can answer
+    a poll; the work itself runs on this process's thread pool inside a
+    fresh app context. Handlers are registered per job kind and receive the
+    ``AIJob`` row, returning the result text.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.timeout = 120
+        self.retention_hours = 24
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._handlers: Dict[str, Callable[[AIJob], str]] = {}
+
+    def init_app(self, app):
+        """
+        Bind the queue to ``app``.
+
+        ``AI_JOB_WORKERS`` sets the pool size; 0 runs jobs inline on
+        ``submit()``, which is handy for tests and CLI use.
+        """
+        self.app = app
+        self.timeout = app.config['AI_JOB_TIMEOUT']
+        self.retention_hours = app.config['AI_JOB_RETENTION_HOURS']
+        workers = app.config['AI_JOB_WORKERS']
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-job') if workers > 0 else None
+
+    def register(self, kind: str, handler: Callable[[AIJob], str]):
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, user_id: int, task_id: Optional[int] = None, input_text: Optional[str] = None) -> AIJob:
+        """Persist a pending job and hand it to the pool; returns immediately."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = AIJob(id=uuid.uuid4().hex, user_id=user_id, task_id=task_id, kind=kind, input_text=input_text)
+        db.session.add(job)
+        db.session.commit()
+        self._maybe_prune()
+
+        if self._executor is None:
+            self._run(job.id)
+            db.session.refresh(job)
+        else:
+            self._executor.submit(self._run_in_context, job.id)
+        return job
+
+    def prune(self) -> int:
+        """Delete jobs older than ``AI_JOB_RETENTION_HOURS``; pollers have long stopped asking by then."""
+        deleted = db.session.query(AIJob).filter(
+            AIJob.created_at < datetime.utcnow() - timedelta(hours=self.retention_hours)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    def _maybe_prune(self):
+        with self._lock:
+            if time.monotonic() - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = time.monotonic()
+        try:
+            self.prune()
+        except Exception:
+            # Housekeeping only; the next interval tries again
+            logger.exception("Pruning old AI jobs failed")
+            db.session.rollback()
+
+    def _run_in_context(self, job_id: str):
+        with self.app.app_context():
+            self._run(job_id)
+
+    def _run(self, job_id: str):
+        job = db.session.get(AIJob, job_id)
+        if job is None:
+            return
+        job.status = 'running'
+        db.session.commit()
+        try:
+            job.result = self._handlers[job.kind](job)
+            job.status = 'done'
+        except JobFailed as e:
+            logger.info("AI job %s (%s) failed: %s", job_id, job.kind, e)
+            db.session.rollback()
+            job = db.session.get(AIJob, job_id)
+            job.status = 'failed'
+        except Exception:
+            logger.exception("AI job %s (%s) failed", job_id, job.kind)
+            db.session.rollback()
+            job = db.session.get(AIJob, job_id)
+            job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def get(self, job_id: str, user_id: int) -> Optional[AIJob]:
+        """
+        Fetch a job owned by ``user_id``.
+
+        Jobs left unfinished past the timeout (e.g. their process restarted)
+        are marked failed so pollers stop waiting.
+        """
+        job = AIJob.query.filter_by(id=job_id, user_id=user_id).first()
+        if job and job.status in ('pending', 'running') and \
+                job.created_at < datetime.utcnow() - timedelta(seconds=self.timeout):
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        return job
+
+
+job_queue = JobQueue()
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from connectapp.extensions import db
+from connectapp.models import User
+
+MAX_CACHED_RANKS = 10000  # distinct scores; the cache starts over when it fills up
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', ['id', 'name', 'score'])
+
+
+class Leaderboard:
+    """
+    Process-wide cache of the top-N and of the rank per distinct score.
+    Ranks are counted through the index on ``User.score`` on a miss rather
+    than derived from every user's score held in memory.
+    """
+
+    def __init__(self, size: int = 5, ttl: float = 30.0):
+        """
+        Args:
+            size: How many entries the cached top-N holds.
+            ttl: Seconds before cached data is reloaded, so changes made by
+                other worker processes show up within a bounded delay.
+        """
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._top: Optional[List[LeaderboardEntry]] = None
+        self._top_loaded_at = 0.0
+        self._ranks: Dict[int, int] = {}  # score -> rank, shared by every user with that score
+        self._ranks_loaded_at = 0.0
+
+    def configure(self, size: int, ttl: float):
+        """Apply app config and drop anything cached under the old settings."""
+        with self._lock:
+            self.size = size
+            self.ttl = ttl
+            self._top = None
+            self._ranks = {}
+
+    def _expired(self, loaded_at: float) -> bool:
+        return time.monotonic() - loaded_at > self.ttl
+
+    def top(self) -> List[LeaderboardEntry]:
+        """Return the cached top-N, reading only N rows through the score index."""
+        with self._lock:
+            if self._top is not None and not self._expired(self._top_loaded_at):
+                return self._top
+
+        rows = db.session.query(User.id, User.name, User.score) \
+            .order_by(User.score.desc(), User.id.asc()) \
+            .limit(self.size).all()
+        top = [LeaderboardEntry(row.id, row.name, row.score or 0) for row in rows]
+
+        with self._lock:
+            self._top = top
+            self._top_loaded_at = time.monotonic()
+        return top
+
+    def rank_of(self, user) -> int:
+        """1-based rank of ``user``; users with equal scores share a rank."""
+        return self.rank_for_score(user.score or 0)
+
+    def rank_for_score(self, score: int) -> int:
+        """
+        1-based rank a user with ``score`` holds.
+
+        Ranks are cached per distinct score until the next score change (or
+        the TTL), so the count of users above a score runs once per score
+        rather than on every dashboard view.
+        """
+        with self._lock:
+            if self._expired(self._ranks_loaded_at):
+                self._ranks = {}
+                self._ranks_loaded_at = time.monotonic()
+            rank = self._ranks.get(score)
+        if rank is not None:
+            return rank
+
+        # A NULL score counts as 0 and, scores being non-negative, is never above anyone
+        rank = db.session.query(func.count(User.id)).filter(User.score > score).scalar() + 1
+
+        with self._lock:
+            if len(self._ranks) >= MAX_CACHED_RANKS:
+                self._ranks = {}
+            self._ranks[score] = rank
+        return rank
+
+    def page(self, page: int, per_page: int) -> Dict:
+        """Return one page of the full leaderboard as plain dicts."""
+        page = max(page, 1)
+        per_page = max(min(per_page, 100), 1)
+        offset = (page - 1) * per_page
+        rows = db.session.query(User.id, User.name, User.score) \
+            .order_by(User.score.desc(), User.id.asc()) \
+            .offset(offset).limit(per_page).all()
+        total = db.session.query(func.count(User.id)).scalar()
+
+        entries = []
+        for position, row in enumerate(rows, start=offset):
+            score = row.score or 0
+            if not entries:
+                rank = self.rank_for_score(score)
+            elif score == entries[-1]['score']:
+                rank = entries[-1]['rank']
+            else:
+                rank = position + 1  # everyone listed before it scored strictly more
+            entries.append({'rank': rank, 'id': row.id, 'name': row.name, 'score': score})
+
+        return {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'entries': entries
+        }
+
+    def record_new_user(self, score: Optional[int] = 0):
+        """
+        Account for a freshly registered user, who may belong in a short
+        top-N. Cached ranks stay: nobody has a new user's 0 points beaten.
+        """
+        with self._lock:
+            if self._top is not None and len(self._top) < self.size:
+                self._top = None
+
+    def invalidate(self):
+        """Drop everything cached (after any committed score change); the next read reloads from the database."""
+        with self._lock:
+            self._top = None
+            self._ranks = {}
+
+
+leaderboard = Leaderboard()
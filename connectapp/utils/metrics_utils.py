@@ -0,0 +1,273 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+PROMPT_TOKEN_BUCKETS = (100, 200, 300, 400, 500, 750, 1000, 2000, 4000)
+SLOW_LOG_STATEMENTS = 5
+INF_LABEL = 'le="+Inf"'
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values (Prometheus semantics)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels: Tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):  # larger values only show up in +Inf (the count)
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        """Yield (labels, [(le, cumulative count)...], sum, count)."""
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            points = []
+            for le, count in zip(self.buckets, series):
+                cumulative += count
+                points.append((le, cumulative))
+            yield labels, points, series[-2], series[-1]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_le(le: float) -> str:
+    return repr(float(le))
+
+
+class Metrics:
+    """
+    Per-process request, SQL and LLM instrumentation rendered in the
+    Prometheus text format.
+
+    ``init_app()`` times every request by URL rule and counts the SQL
+    statements (and their time) each request runs via engine events. Gemini
+    calls are timed by kind through ``observe_llm()`` and their prompt sizes
+    recorded through ``observe_prompt()``; callers record the times they had
+    to serve a canned answer with ``record_fallback()``.
+    Other components contribute gauges through ``add_collector()``, a
+    callable returning a flat dict of numbers.
+
+    Each worker process keeps its own numbers; scrape every worker (or
+    aggregate in Prometheus) when running more than one.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.slow_request_seconds = 0.0
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)  # (endpoint, method, status) -> count
+        self._latency = Histogram(LATENCY_BUCKETS)  # (endpoint, method)
+        self._request_queries = Histogram(QUERY_COUNT_BUCKETS)  # (endpoint,)
+        self._request_sql_seconds = defaultdict(float)  # endpoint -> seconds
+        self._sql = [0, 0.0]  # all statements in the process: count, seconds
+        self._llm = Histogram(LATENCY_BUCKETS)  # (kind, outcome)
+        self._fallbacks = defaultdict(int)  # kind -> count
+        self._prompt_tokens = Histogram(PROMPT_TOKEN_BUCKETS)  # (kind,)
+        self._collectors: Dict[str, Callable[[], Dict]] = {}
+
+    def init_app(self, app, db):
+        """
+        Install request hooks and SQL timing on ``db``'s engine.
+
+        ``METRICS_ENABLED`` turns instrumentation off entirely;
+        ``SLOW_REQUEST_MS`` (0 disables) logs slower requests with their
+        SQL breakdown.
+        """
+        self.enabled = app.config['METRICS_ENABLED']
+        self.slow_request_seconds = app.config['SLOW_REQUEST_MS'] / 1000
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(db.engine, 'handle_error', self._handle_error)
+
+    def add_collector(self, name: str, collect: Callable[[], Dict]):
+        self._collectors[name] = collect
+
+    # Requests
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql = [0, 0.0]
+        g.metrics_llm = [0, 0.0]
+        g.metrics_statements = defaultdict(lambda: [0, 0.0]) if self.slow_request_seconds > 0 else None
+
+    def _finish_request(self, response):
+        self._record_request(response.status_code)
+        return response
+
+    def _teardown_request(self, exc):
+        if exc is not None:
+            self._record_request(500)  # no-op if after_request already ran
+
+    def _record_request(self, status: int):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        queries, sql_seconds = g.metrics_sql
+        with self._lock:
+            self._requests[(endpoint, request.method, status)] += 1
+            self._latency.observe((endpoint, request.method), elapsed)
+            self._request_queries.observe((endpoint,), queries)
+            self._request_sql_seconds[endpoint] += sql_seconds
+
+        if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+            self._log_slow_request(endpoint, status, elapsed)
+
+    def _log_slow_request(self, endpoint: str, status: int, elapsed: float):
+        queries, sql_seconds = g.metrics_sql
+        llm_calls, llm_seconds = g.metrics_llm
+        top = sorted(g.metrics_statements.items(), key=lambda item: item[1][1], reverse=True)[:SLOW_LOG_STATEMENTS]
+        breakdown = ''.join(f"\n  {count}x {seconds * 1000:.1f} ms  {statement}"
+                            for statement, (count, seconds) in top)
+        logger.warning("Slow request %s %s -> %d in %.0f ms: %d queries (%.0f ms SQL), %d LLM calls (%.0f ms)%s",
+                       request.method, endpoint, status, elapsed * 1000, queries, sql_seconds * 1000,
+                       llm_calls, llm_seconds * 1000, breakdown)
+
+    # SQL
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+        with self._lock:
+            self._sql[0] += 1
+            self._sql[1] += elapsed
+        if has_request_context() and 'metrics_sql' in g:
+            g.metrics_sql[0] += 1
+            g.metrics_sql[1] += elapsed
+            if g.metrics_statements is not None:
+                entry = g.metrics_statements[' '.join(statement.split())[:120]]
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        if context.connection is not None:
+            starts = context.connection.info.get('metrics_query_start')
+            if starts:
+                starts.pop()
+
+    # LLM
+
+    def observe_llm(self, kind: str, outcome: str, seconds: float):
+        """Record one upstream call; ``outcome`` is ``ok``, ``error`` or ``circuit_open``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._llm.observe((kind, outcome), seconds)
+        if has_request_context() and 'metrics_llm' in g:
+            g.metrics_llm[0] += 1
+            g.metrics_llm[1] += seconds
+
+    def observe_prompt(self, kind: str, tokens: int):
+        """Record the estimated input size of one prompt."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._prompt_tokens.observe((kind,), tokens)
+
+    def record_fallback(self, kind: str):
+        """Count a response that was served from a canned fallback instead of the model."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._fallbacks[kind] += 1
+
+    # Exposition
+
+    def render(self) -> str:
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, help_text, hist, label_names):
+            header(name, 'histogram', help_text)
+            for labels, points, total, count in hist.samples():
+                for le, cumulative in points:
+                    le_label = 'le="%s"' % _format_le(le)
+                    lines.append(f'{name}_bucket{_labels(label_names, labels, le_label)} {cumulative}')
+                lines.append(f'{name}_bucket{_labels(label_names, labels, INF_LABEL)} {count}')
+                lines.append(f'{name}_sum{_labels(label_names, labels)} {total}')
+                lines.append(f'{name}_count{_labels(label_names, labels)} {count}')
+
+        with self._lock:
+            header('connectapp_http_requests_total', 'counter', 'Requests by endpoint, method and status.')
+            for labels, count in sorted(self._requests.items()):
+                lines.append(f'connectapp_http_requests_total{_labels(("endpoint", "method", "status"), labels)} '
+                             f'{count}')
+            histogram('connectapp_http_request_duration_seconds', 'Request latency by endpoint.',
+                      self._latency, ('endpoint', 'method'))
+            histogram('connectapp_http_request_sql_queries', 'SQL statements per request by endpoint.',
+                      self._request_queries, ('endpoint',))
+            header('connectapp_http_request_sql_seconds_total', 'counter', 'Time spent in SQL by endpoint.')
+            for endpoint, seconds in sorted(self._request_sql_seconds.items()):
+                lines.append(f'connectapp_http_request_sql_seconds_total{_labels(("endpoint",), (endpoint,))} '
+                             f'{seconds}')
+            header('connectapp_sql_queries_total', 'counter', 'SQL statements run by this process.')
+            lines.append(f'connectapp_sql_queries_total {self._sql[0]}')
+            header('connectapp_sql_seconds_total', 'counter', 'Time spent in SQL by this process.')
+            lines.append(f'connectapp_sql_seconds_total {self._sql[1]}')
+            histogram('connectapp_llm_call_duration_seconds', 'Gemini call latency (retries included) by kind.',
+                      self._llm, ('kind', 'outcome'))
+            histogram('connectapp_llm_prompt_tokens', 'Estimated prompt size in tokens by kind.',
+                      self._prompt_tokens, ('kind',))
+            header('connectapp_llm_fallbacks_total', 'counter', 'Responses served from a canned fallback, by kind.')
+            for kind, count in sorted(self._fallbacks.items()):
+                lines.append(f'connectapp_llm_fallbacks_total{_labels(("kind",), (kind,))} {count}')
+
+        for name, collect in sorted(self._collectors.items()):
+            try:
+                stats = collect()
+            except Exception:
+                logger.exception("Metrics collector %s failed", name)
+                continue
+            for key, value in sorted(stats.items()):
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                metric = f'connectapp_{name}_{key}'
+                lines.append(f'# TYPE {metric} gauge')
+                lines.append(f'{metric} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
@@ -0,0 +1,177 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from connectapp.extensions import db
+from connectapp.models import User, DailyTask
+from connectapp.utils.task_provider_utils import get_task_provider
+from connectapp.utils.progress_utils import record_task_created, save_rebuilt_progress
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting how often workers may call the upstream."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Calls allowed per second; 0 or less disables limiting.
+            burst: How many calls may be made back to back before waiting.
+        """
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call is allowed."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def find_users_needing_tasks(task_date: date, active_days: Optional[int]) -> List[User]:
+    """
+    Return users without a task for ``task_date``.
+
+    Users who already have one are skipped, which is what makes an
+    interrupted run resumable: rerunning only picks up the remainder.
+
+    Args:
+        task_date: Day the tasks are being generated for.
+        active_days: Only include users with a task in this many days
+            before ``task_date``; ``None`` includes everyone.
+    """
+    has_task = db.session.query(DailyTask.user_id).filter(DailyTask.task_date == task_date)
+    query = User.query.filter(~User.id.in_(has_task))
+    if active_days is not None:
+        since = task_date - timedelta(days=active_days)
+        active = db.session.query(DailyTask.user_id).filter(DailyTask.task_date >= since)
+        query = query.filter(User.id.in_(active))
+    return query.order_by(User.id).all()
+
+
+def _commit_batch(batch: List[Tuple[int, Dict]], task_date: date) -> int:
+    """
+    Insert generated tasks and commit; returns how many rows went in.
+
+    A user may have received a task inline while their batch was pending.
+    The unique ``(user_id, task_date)`` index then rejects the commit, so
+    those users are dropped and the rest of the batch is retried.
+    """
+    while batch:
+        try:
+            for user_id, task_data in batch:
+                task = DailyTask(
+                    user_id=user_id,
+                    task_text=task_data['task_text'],
+                    difficulty=task_data['difficulty'],
+                    task_date=task_date,
+                    created_at=datetime.utcnow()
+                )
+                db.session.add(task)
+                record_task_created(task)  # autoflushes, so a conflict can surface here too
+            db.session.commit()
+            return len(batch)
+        except IntegrityError:
+            db.session.rollback()
+            taken = {user_id for (user_id,) in db.session.query(DailyTask.user_id).filter(
+                DailyTask.task_date == task_date,
+                DailyTask.user_id.in_([user_id for user_id, _ in batch])
+            )}
+            if not taken:
+                raise
+            batch = [entry for entry in batch if entry[0] not in taken]
+    return 0
+
+
+def _generate(users: List[User], progress_for: Callable[[User], Dict], provider, workers: int, rate: float):
+    """
+    Yield ``(user_id, task_data, error)`` as tasks are generated.
+
+    Remote providers run in the rate-limited worker pool. Local ones (the
+    template engine, inventory claims) are cheap and may use the DB session,
+    so they run inline on the calling thread.
+    """
+    if not provider.remote:
+        for user in users:
+            try:
+                yield user.id, provider.generate(progress_for(user)), None
+            except Exception as e:
+                yield user.id, None, e
+        return
+
+    limiter = RateLimiter(rate, burst=workers)
+
+    def generate(progress):
+        limiter.acquire()
+        return provider.generate(progress)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {pool.submit(generate, progress_for(user)): user.id for user in users}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def pregenerate_tasks(task_date: date,
+                      progress_for: Callable[[User], Dict],
+                      workers: int = 4,
+                      rate: float = 5.0,
+                      batch_size: int = 50,
+                      active_days: Optional[int] = 7,
+                      log: Callable[[str], None] = print) -> Dict:
+    """
+    Generate ``DailyTask`` rows for ``task_date`` ahead of time.
+
+    Progress snapshots are read on the calling thread (which owns the app
+    context and DB session); only upstream calls run in the worker pool.
+    Finished tasks are committed every ``batch_size`` rows so a crash loses
+    at most one batch.
+
+    Returns:
+        Dict with counts: pending, created, failed
+    """
+    users = find_users_needing_tasks(task_date, active_days)
+    log(f"{len(users)} users need a task for {task_date.isoformat()}")
+    if not users:
+        return {'pending': 0, 'created': 0, 'failed': 0}
+
+    def snapshot(user):
+        progress = progress_for(user)
+        save_rebuilt_progress()  # not held open until the next batch commits
+        return progress
+
+    created = 0
+    failed = 0
+    batch = []
+    provider = get_task_provider().for_batch()
+    for user_id, task_data, error in _generate(users, snapshot, provider, workers, rate):
+        if error is not None:
+            failed += 1
+            log(f"user {user_id}: generation failed ({error})")
+            continue
+
+        batch.append((user_id, task_data))
+        if len(batch) >= batch_size:
+            created += _commit_batch(batch, task_date)
+            batch = []
+            log(f"committed {created}/{len(users)}")
+
+    created += _commit_batch(batch, task_date)
+    log(f"done: {created} created, {failed} failed")
+    return {'pending': len(users), 'created': created, 'failed': failed}
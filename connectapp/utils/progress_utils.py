@@ -0,0 +1,217 @@
+import json
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, event, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from connectapp.extensions import db
+from connectapp.models import DailyTask, UserProgress
+
+WINDOW_DAYS = 30
+RECENT_TASKS = 5
+STREAK_PAGE = 64  # completed days read per query while walking a streak back
+REBUILT_KEY = 'progress_rebuilt'
+
+
+def _streak_ending(user_id: int, day: Optional[date]) -> int:
+    """Consecutive days with a completed task ending on ``day``, walked back through the (user_id, task_date) index."""
+    streak = 0
+    while day is not None:
+        days = [task_date for (task_date,) in db.session.query(DailyTask.task_date).filter(
+            DailyTask.user_id == user_id,
+            DailyTask.completed == True,
+            DailyTask.task_date <= day
+        ).order_by(DailyTask.task_date.desc()).limit(STREAK_PAGE)]
+        for task_date in days:
+            if task_date != day:
+                return streak
+            streak += 1
+            day -= timedelta(days=1)
+        if len(days) < STREAK_PAGE:
+            break
+    return streak
+
+
+def _rebuild(user_id: int, today: date) -> UserProgress:
+    """Recompute a user's window with one aggregate query plus a LIMIT query for recent texts."""
+    window_start = today - timedelta(days=WINDOW_DAYS)
+    total, completed = db.session.query(
+        func.count(DailyTask.id),
+        func.coalesce(func.sum(case((DailyTask.completed == True, 1), else_=0)), 0)
+    ).filter(
+        DailyTask.user_id == user_id,
+        DailyTask.task_date >= window_start
+    ).one()
+
+    recent = db.session.query(DailyTask.task_text).filter(
+        DailyTask.user_id == user_id,
+        DailyTask.completed == True,
+        DailyTask.task_date >= window_start
+    ).order_by(DailyTask.task_date.desc(), DailyTask.id.desc()).limit(RECENT_TASKS).all()
+
+    last_completed_on = db.session.query(func.max(DailyTask.task_date)).filter(
+        DailyTask.user_id == user_id,
+        DailyTask.completed == True
+    ).scalar()
+
+    progress = db.session.get(UserProgress, user_id) or UserProgress(user_id=user_id)
+    progress.window_start = window_start
+    progress.computed_on = today
+    progress.total_count = total
+    progress.completed_count = completed
+    progress.recent_tasks = json.dumps([text for (text,) in reversed(recent)])
+    # A streak only changes with a new completion; re-walking it unchanged could cut it short once old tasks are archived
+    if progress.last_completed_on != last_completed_on or progress.current_streak is None:
+        progress.last_completed_on = last_completed_on
+        progress.current_streak = _streak_ending(user_id, last_completed_on)
+        progress.best_streak = max(progress.best_streak or 0, progress.current_streak)
+    try:
+        # A savepoint, not a commit: the caller owns the transaction and commits the rebuilt row with its own work
+        with db.session.begin_nested():
+            db.session.add(progress)
+        db.session.info[REBUILT_KEY] = True
+    except IntegrityError:
+        # Another worker inserted the row first; its numbers are just as fresh
+        progress = db.session.get(UserProgress, user_id)
+    return progress
+
+
+def get_user_progress(user) -> Dict:
+    """
+    Extract user progress data for Gemini API.
+
+    Normally a single primary-key read of ``UserProgress``; the window is
+    rebuilt from ``daily_task`` at most once per day per user, when it has
+    slid forward. A rebuilt row is only flushed; it is saved when the
+    caller commits.
+
+    Returns:
+        Dict with keys: completed_tasks (recent texts, oldest first),
+        completed_count, total_count, difficulty_preference,
+        recent_activities, success_rate, user_score, user_id,
+        current_streak (0 once a day has been missed), best_streak
+    """
+    today = date.today()
+    progress = db.session.get(UserProgress, user.id)
+    if progress is None or progress.computed_on != today:
+        progress = _rebuild(user.id, today)
+
+    total = progress.total_count
+    completed = progress.completed_count
+    success_rate = completed / total if total > 0 else 0.5
+    recent_tasks: List[str] = json.loads(progress.recent_tasks or '[]')
+
+    # Determine difficulty preference based on user's history
+    difficulty_preference = 'medium'  # Default
+    if success_rate > 0.8:
+        difficulty_preference = 'hard'
+    elif success_rate < 0.3:
+        difficulty_preference = 'easy'
+
+    return {
+        'completed_tasks': recent_tasks,
+        'completed_count': completed,
+        'total_count': total,
+        'difficulty_preference': difficulty_preference,
+        'recent_activities': recent_tasks,
+        'success_rate': success_rate,
+        'user_score': user.score,
+        'user_id': user.id,
+        'current_streak': current_streak(progress, today),
+        'best_streak': progress.best_streak or 0
+    }
+
+
+def save_rebuilt_progress():
+    """
+    Commit now if a progress read in this transaction had to rebuild its
+    row. Call it before slow work (a Gemini call) so the write isn't held
+    open meanwhile; otherwise a no-op.
+    """
+    if db.session.info.get(REBUILT_KEY):
+        db.session.commit()
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _forget_rebuild(session):
+    session.info.pop(REBUILT_KEY, None)
+
+
+def current_streak(progress: UserProgress, today: date) -> int:
+    """The stored streak while it is still alive (last completion today or yesterday), else 0."""
+    if progress.last_completed_on is None or progress.last_completed_on < today - timedelta(days=1):
+        return 0
+    return progress.current_streak or 0
+
+
+def _adjust(task: DailyTask, total_delta: int, completed_delta: int):
+    """
+    Atomically shift a user's counters inside the caller's transaction.
+
+    Rows that don't exist yet, or whose window doesn't include the task,
+    are left alone; they are rebuilt on the next read.
+    """
+    db.session.query(UserProgress).filter(
+        UserProgress.user_id == task.user_id,
+        UserProgress.window_start <= task.task_date
+    ).update({
+        UserProgress.total_count: UserProgress.total_count + total_delta,
+        UserProgress.completed_count: UserProgress.completed_count + completed_delta
+    }, synchronize_session=False)
+
+
+def record_task_created(task: DailyTask):
+    """Count a new task; call before committing the session that adds it."""
+    _adjust(task, 1, 1 if task.completed else 0)
+
+
+def record_task_deleted(task: DailyTask):
+    """Uncount a task; call before committing the session that deletes it."""
+    _adjust(task, -1, -1 if task.completed else 0)
+
+
+def record_tasks_completed(user_id: int, tasks: Iterable[DailyTask]):
+    """
+    Count newly completed ``tasks`` (all of one user) and move their streak
+    on; call in the transaction that marks them completed.
+
+    One counter UPDATE covers the whole batch. A streak that simply
+    continues is extended in place; otherwise (backfilled days) it is
+    re-walked from the latest completed day, normally one indexed query.
+    Users without a progress row are left alone; the next read rebuilds it.
+    """
+    progress = db.session.get(UserProgress, user_id)
+    if progress is None:
+        return
+    tasks = sorted(tasks, key=lambda task: (task.task_date, task.id))
+    in_window = [task for task in tasks if task.task_date >= progress.window_start]
+    if in_window:
+        db.session.query(UserProgress).filter(UserProgress.user_id == user_id).update({
+            UserProgress.completed_count: UserProgress.completed_count + len(in_window)
+        }, synchronize_session='fetch')
+        recent = json.loads(progress.recent_tasks or '[]')
+        recent.extend(task.task_text for task in in_window)
+        progress.recent_tasks = json.dumps(recent[-RECENT_TASKS:])
+
+    if not tasks:
+        return
+    last = progress.last_completed_on
+    days = [task.task_date for task in tasks]
+    if last is not None and progress.current_streak and \
+            days == [last + timedelta(days=offset) for offset in range(1, len(days) + 1)]:
+        # The usual case: the streak simply continues, no need to walk it back
+        progress.current_streak += len(days)
+        progress.last_completed_on = days[-1]
+    else:
+        if last is None or days[-1] > last:
+            progress.last_completed_on = days[-1]
+        progress.current_streak = _streak_ending(user_id, progress.last_completed_on)
+    progress.best_streak = max(progress.best_streak or 0, progress.current_streak)
+
+
+def record_task_completed(task: DailyTask):
+    """Count a task as completed and add it to the user's recent tasks."""
+    record_tasks_completed(task.user_id, [task])
@@ -0,0 +1,179 @@
+import logging
+from typing import Dict, Iterable, List
+
+from connectapp.utils.metrics_utils import metrics
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # rough average for English text; good enough for budgeting
+
+DIFFICULTY_DESCRIPTIONS = {
+    'easy': 'simple, low-pressure social interactions that build confidence',
+    'medium': 'moderate social challenges that require some effort but are achievable',
+    'hard': 'challenging social tasks that push comfort zones and build strong connections'
+}
+
+_REQUIREMENTS = """Requirements:
+- Make it specific and actionable (not vague)
+- Focus on building genuine connections with others
+- Be encouraging and positive
+- Keep it to 1-2 sentences maximum
+- Make it something that can be completed in one day"""
+
+# Static parts come first and are built once per process; only the short
+# per-user context below them changes between calls.
+_TASK_PREFIXES = {
+    difficulty: f"""You are a social connection coach helping users build meaningful relationships through daily challenges.
+
+Generate ONE specific, actionable social challenge for today that is {description}.
+
+{_REQUIREMENTS}
+- Avoid repeating the user's recent tasks or generic challenges
+
+Examples of good challenges:
+- "Ask a colleague about their weekend plans and share one of your own"
+- "Compliment someone on their work and ask them about their process"
+- "Start a conversation with someone in line at a coffee shop"
+
+Respond with ONLY the challenge text, no additional formatting or explanation.
+
+Context about the user:
+"""
+    for difficulty, description in DIFFICULTY_DESCRIPTIONS.items()
+}
+
+_SUGGESTION_PREFIX = """You are a social connection coach. Give ONE specific, actionable suggestion that helps the user complete their daily challenge. Make it encouraging and practical.
+
+Requirements:
+- Be specific and actionable (not vague)
+- Focus on practical steps they can take
+- Be encouraging and positive
+- Keep it to 1-2 sentences maximum
+- Make it relevant to the specific task
+
+Respond with ONLY the suggestion text, no additional formatting.
+
+"""
+
+_SIMPLIFY_PREFIX = """You are a social connection coach. The user is struggling with a task. Write a SIMPLIFIED version that is easier to complete but still builds social connections.
+
+Requirements:
+- Make it significantly easier than the original
+- Keep the same social connection goal
+- Be specific and actionable
+- Make it achievable for someone who might be shy or nervous
+- Keep it to 1-2 sentences maximum
+- Focus on low-pressure social interactions
+
+Examples of simplified tasks:
+- "Say hello and smile at one person today"
+- "Make eye contact and nod at someone you pass by"
+- "Ask one person 'How's your day going?'"
+
+Respond with ONLY the simplified task text, no additional formatting.
+
+"""
+
+_BATCH_PREFIXES = {
+    difficulty: f"""You are a social connection coach writing daily challenges for many different people.
+
+Each challenge must be {description}.
+
+{_REQUIREMENTS}
+- No two challenges should be alike
+
+"""
+    for difficulty, description in DIFFICULTY_DESCRIPTIONS.items()
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + '…'
+
+
+class PromptBuilder:
+    """
+    Builds the Gemini prompts from cached static prefixes plus a dynamic
+    part held to ``context_tokens``.
+
+    Recent task texts are whitespace-normalized, deduplicated, clipped to
+    ``max_task_chars`` and added newest first until the budget runs out, so
+    prompt size stays flat however long a user's history gets. Every prompt
+    built is logged (debug) and recorded in the prompt-size metrics.
+    """
+
+    def __init__(self, context_tokens: int = 200, max_task_chars: int = 160):
+        self.context_tokens = context_tokens
+        self.max_task_chars = max_task_chars
+
+    def configure(self, context_tokens: int, max_task_chars: int):
+        self.context_tokens = context_tokens
+        self.max_task_chars = max_task_chars
+
+    def recent_tasks(self, texts: Iterable[str], budget_tokens: int) -> List[str]:
+        """Newest-first, deduplicated, clipped texts that fit in ``budget_tokens``; returned oldest first."""
+        picked = []
+        seen = set()
+        for text in reversed(list(texts)):
+            clipped = _clip(text, self.max_task_chars)
+            key = clipped.casefold()
+            if not clipped or key in seen:
+                continue
+            cost = estimate_tokens(clipped) + 1  # "- " prefix and newline
+            if cost > budget_tokens:
+                break
+            seen.add(key)
+            picked.append(clipped)
+            budget_tokens -= cost
+        return list(reversed(picked))
+
+    def task(self, user_progress: Dict, difficulty: str) -> str:
+        completed_tasks = user_progress.get('completed_tasks', [])
+        completed_count = user_progress.get('completed_count', len(completed_tasks))
+        # recent_activities has been the same list as completed_tasks; merging them removes the duplicate block
+        history = list(user_progress.get('recent_activities', [])) + list(completed_tasks)
+
+        lines = [f"Difficulty level: {difficulty}"]
+        if history:
+            lines.insert(0, f"User has completed {completed_count} tasks recently.")
+        budget = self.context_tokens - estimate_tokens('\n'.join(lines))
+        recent = self.recent_tasks(history, budget)
+        if recent:
+            lines.insert(1, "Recent completed tasks:")
+            lines[2:2] = [f"- {text}" for text in recent]
+        return self._finish('task', _TASK_PREFIXES.get(difficulty, _TASK_PREFIXES['medium']), '\n'.join(lines))
+
+    def suggestion(self, task_text: str, user_progress: Dict) -> str:
+        context = (
+            f'TASK: "{_clip(task_text, self.max_task_chars * 2)}"\n\n'
+            f"User's recent progress:\n"
+            f"- Completed tasks: {user_progress.get('completed_count', 0)} recent tasks\n"
+            f"- Success rate: {user_progress.get('success_rate', 0.5):.1%}\n"
+            f"- Difficulty preference: {user_progress.get('difficulty_preference', 'medium')}"
+        )
+        return self._finish('suggestion', _SUGGESTION_PREFIX, context)
+
+    def simplify(self, task_text: str) -> str:
+        context = f'ORIGINAL TASK: "{_clip(task_text, self.max_task_chars * 2)}"'
+        return self._finish('simplify', _SIMPLIFY_PREFIX, context)
+
+    def batch(self, difficulty: str, count: int) -> str:
+        context = f"Write {count} different challenges. Respond with ONLY a JSON array of {count} strings, " \
+                  f"no additional formatting or explanation."
+        return self._finish('batch', _BATCH_PREFIXES.get(difficulty, _BATCH_PREFIXES['medium']), context)
+
+    def _finish(self, kind: str, prefix: str, context: str) -> str:
+        prompt = prefix + context + '\n'
+        tokens = estimate_tokens(prompt)
+        metrics.observe_prompt(kind, tokens)
+        logger.debug("%s prompt: %d chars, ~%d tokens (%d dynamic)", kind, len(prompt), tokens,
+                     estimate_tokens(context))
+        return prompt
+
+
+prompt_builder = PromptBuilder()
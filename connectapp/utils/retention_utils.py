@@ -0,0 +1,155 @@
+import json
+import logging
+import zlib
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+
+from connectapp.extensions import db
+from connectapp.models import AIJob, DailyRollup, DailyTask, DailyTaskArchive
+from connectapp.utils.progress_utils import WINDOW_DAYS
+
+logger = logging.getLogger(__name__)
+
+TASK_FIELDS = ('id', 'task_text', 'suggestion', 'completed', 'task_date', 'difficulty', 'created_at',
+               'simplified_count', 'xp_points')
+DATE_FIELDS = {'task_date': date.fromisoformat, 'created_at': datetime.fromisoformat}
+COMPRESSION_LEVEL = 6
+
+
+def _pack(rows: List[Dict]) -> bytes:
+    data = [{field: value.isoformat() if isinstance(value, (date, datetime)) else value
+             for field, value in row.items() if field != 'user_id'}
+            for row in rows]
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def _unpack(payload: bytes) -> List[Dict]:
+    rows = json.loads(zlib.decompress(payload).decode('utf-8'))
+    for row in rows:
+        for field, parse in DATE_FIELDS.items():
+            if row.get(field) is not None:
+                row[field] = parse(row[field])
+    return rows
+
+
+def archive_cutoff(retention_days: int, today: Optional[date] = None) -> Optional[date]:
+    """
+    First day that stays in the hot table: ``retention_days`` ago, but never
+    past the analytics rollups, so no day is archived before it is rolled
+    up. None when nothing may be archived yet.
+    """
+    if retention_days < WINDOW_DAYS:
+        raise ValueError(f"retention_days must be at least the {WINDOW_DAYS}-day progress window")
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    rolled_up_through = db.session.query(func.max(DailyRollup.day)).scalar()
+    if rolled_up_through is None:
+        return None
+    return min(cutoff, rolled_up_through + timedelta(days=1))
+
+
+def archive_tasks(retention_days: int, batch_size: int = 2000,
+                  log: Callable[[str], None] = logger.info) -> Dict:
+    """
+    Move daily tasks older than the cutoff (see ``archive_cutoff``) out of
+    ``daily_task`` into compressed ``DailyTaskArchive`` chunks.
+
+    Rows are read in (user_id, task_date) index order, ``batch_size`` at a
+    time; each batch writes one chunk per user and month, detaches AI jobs
+    from the archived tasks and deletes them, all in one transaction. An
+    interrupted run loses nothing and simply resumes where it stopped on the
+    next run.
+
+    Returns:
+        Dict with archived (tasks), chunks, batches and cutoff.
+    """
+    cutoff = archive_cutoff(retention_days)
+    result = {'archived': 0, 'chunks': 0, 'batches': 0, 'cutoff': cutoff}
+    if cutoff is None:
+        log("nothing archived: analytics haven't been rolled up yet (flask rollup-analytics)")
+        return result
+
+    tasks = DailyTask.__table__
+    columns = [tasks.c.user_id] + [tasks.c[field] for field in TASK_FIELDS]
+    after_user = 0
+    while True:
+        rows = [row._asdict() for row in db.session.execute(
+            select(*columns)
+            .where(tasks.c.user_id >= after_user, tasks.c.task_date < cutoff)
+            .order_by(tasks.c.user_id, tasks.c.task_date)
+            .limit(batch_size)
+        )]
+        if not rows:
+            break
+
+        now = datetime.utcnow()
+        chunks = []
+        for (user_id, _), group in groupby(rows, key=lambda row: (row['user_id'], row['task_date'].strftime('%Y-%m'))):
+            group = list(group)
+            chunks.append({
+                'user_id': user_id,
+                'first_day': group[0]['task_date'],
+                'last_day': group[-1]['task_date'],
+                'task_count': len(group),
+                'payload': _pack(group),
+                'archived_at': now
+            })
+        ids = [row['id'] for row in rows]
+        db.session.execute(insert(DailyTaskArchive), chunks)
+        db.session.execute(update(AIJob).where(AIJob.task_id.in_(ids)).values(task_id=None))
+        db.session.execute(delete(DailyTask).where(DailyTask.id.in_(ids)))
+        db.session.commit()
+
+        result['archived'] += len(rows)
+        result['chunks'] += len(chunks)
+        result['batches'] += 1
+        log(f"archived {result['archived']} tasks (through user {rows[-1]['user_id']})")
+        if len(rows) < batch_size:
+            break
+        after_user = rows[-1]['user_id']  # that user may have more old rows; they're next
+    return result
+
+
+def task_history(user_id: int, since: Optional[date] = None) -> Iterator[Dict]:
+    """
+    A user's full task history, oldest first: archived chunks (decompressed
+    one at a time) followed by the hot rows.
+
+    Each task is a dict of ``TASK_FIELDS`` plus ``archived``. Hot-path code
+    should keep querying ``DailyTask`` directly; this is for exports and
+    other rare full-history reads.
+    """
+    chunks = db.session.query(DailyTaskArchive.payload).filter(DailyTaskArchive.user_id == user_id)
+    if since is not None:
+        chunks = chunks.filter(DailyTaskArchive.last_day >= since)
+    for (payload,) in chunks.order_by(DailyTaskArchive.first_day, DailyTaskArchive.id):
+        for row in _unpack(payload):
+            if since is None or row['task_date'] >= since:
+                row['archived'] = True
+                yield row
+
+    hot = db.session.query(*(getattr(DailyTask, field) for field in TASK_FIELDS)) \
+        .filter(DailyTask.user_id == user_id)
+    if since is not None:
+        hot = hot.filter(DailyTask.task_date >= since)
+    for row in hot.order_by(DailyTask.task_date, DailyTask.id):
+        task = row._asdict()
+        task['archived'] = False
+        yield task
+
+
+def archive_stats() -> Dict:
+    chunks, tasks, compressed = db.session.query(
+        func.count(DailyTaskArchive.id),
+        func.coalesce(func.sum(DailyTaskArchive.task_count), 0),
+        func.coalesce(func.sum(func.length(DailyTaskArchive.payload)), 0)
+    ).one()
+    return {
+        'hot_tasks': db.session.query(func.count(DailyTask.id)).scalar(),
+        'archived_tasks': tasks,
+        'archive_chunks': chunks,
+        'archive_bytes': compressed,
+        'oldest_hot_day': db.session.query(func.min(DailyTask.task_date)).scalar()
+    }
@@ -0,0 +1,264 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, func, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from connectapp.extensions import db
+from connectapp.models import ScoreEvent, User
+from connectapp.utils.leaderboard_utils import leaderboard
+from connectapp.utils.user_cache_utils import session_user_cache
+
+logger = logging.getLogger(__name__)
+
+CHANGES_KEY = 'score_changes'
+
+REFERRAL_POINTS = 20
+
+_add_to_score = update(User.__table__) \
+    .where(User.__table__.c.id == bindparam('user_id_')) \
+    .values(score=func.coalesce(User.__table__.c.score, 0) + bindparam('delta_'))
+
+
+class _Conflict(Exception):
+    """Another aggregator claimed some of the events first."""
+
+
+def _apply(conn, totals: Dict[int, int]) -> List[Tuple[int, int, int]]:
+    """
+    Add ``totals`` (user_id -> delta) to the users' scores with atomic
+    ``score = score + :delta`` updates; returns (user_id, old, new) per user.
+
+    Users are updated in id order so concurrent aggregators can't deadlock,
+    and the new scores are read back after the updates, while their rows are
+    still locked, so old = new - delta is exact.
+    """
+    user_ids = sorted(totals)
+    conn.execute(_add_to_score, [{'user_id_': user_id, 'delta_': totals[user_id]} for user_id in user_ids])
+    scores = dict(conn.execute(select(User.id, User.score).where(User.id.in_(user_ids))).all())
+    return [(user_id, scores[user_id] - totals[user_id], scores[user_id])
+            for user_id in user_ids if user_id in scores]
+
+
+def _publish(changes: Iterable[Tuple[int, int, int]]):
+    """Bring the process caches in step with committed score changes."""
+    changed = False
+    for user_id, _, _ in changes:
+        session_user_cache.invalidate(user_id)
+        changed = True
+    if changed:
+        leaderboard.invalidate()
+
+
+class ScoreLedger:
+    """
+    Append-only score ledger with a write-behind aggregator.
+
+    ``award()`` only inserts a ``ScoreEvent`` in the caller's transaction,
+    so awarding points takes no lock on the (hot) user rows. A background
+    thread folds unapplied events into ``User.score`` every ``interval``
+    seconds, summing each user's events and issuing one atomic
+    ``UPDATE ... SET score = score + :delta`` per user, so concurrent awards
+    never lose increments.
+
+    The thread is started lazily, by the first request or award in each
+    process, so CLI commands and a pre-forking server's master never run
+    one. With ``SCORE_FLUSH_INTERVAL=0`` there is no thread: ``award()``
+    applies the delta in the caller's transaction instead, which is handy
+    for tests and CLI use. Events left pending by a stopped process are
+    picked up by the next aggregator; ``flush()`` can also be run by hand.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.interval = 2.0
+        self.batch_size = 500
+        self._thread: Optional[threading.Thread] = None
+        self._stop: Optional[threading.Event] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.awarded = 0
+        self.applied = 0
+        self.flushes = 0
+        self.conflicts = 0
+        self.errors = 0
+        self.last_flush_seconds = 0.0
+
+    def init_app(self, app):
+        """Apply ``SCORE_FLUSH_*`` settings; the aggregator starts with the first request."""
+        self.app = app
+        self.interval = app.config['SCORE_FLUSH_INTERVAL']
+        self.batch_size = app.config['SCORE_FLUSH_BATCH']
+        self.shutdown()
+        if self.interval > 0:
+            app.before_request(self._ensure_running)
+
+    def shutdown(self):
+        with self._lock:
+            if self._stop is not None:
+                self._stop.set()
+            self._thread = self._stop = self._pid = None
+
+    def _ensure_running(self):
+        """Start this process's aggregator thread if it isn't running yet."""
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A thread inherited across fork() doesn't run in the child; start a fresh one
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                            name='score-ledger', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def award(self, user_id: int, delta: int, reason: str, ref_id: Optional[int] = None) -> ScoreEvent:
+        """
+        Record ``delta`` points for ``user_id``; the caller commits.
+
+        ``(user_id, reason, ref_id)`` is unique, so awarding the same thing
+        twice fails the commit with an IntegrityError.
+        """
+        score_event = ScoreEvent(user_id=user_id, delta=delta, reason=reason, ref_id=ref_id,
+                                 created_at=datetime.utcnow())
+        session = db.session()
+        inline = self.interval <= 0
+        if inline:
+            score_event.applied_at = score_event.created_at
+        session.add(score_event)
+        self._settle(session, user_id, delta, 1)
+        return score_event
+
+    def award_many(self, user_id: int, awards: Iterable[Tuple[int, str, Optional[int]]]) -> int:
+        """
+        Record several ``(delta, reason, ref_id)`` awards for ``user_id`` with
+        one multi-row INSERT (and, inline, one score UPDATE for their sum);
+        the caller commits. Returns the number of events recorded.
+        """
+        now = datetime.utcnow()
+        applied_at = now if self.interval <= 0 else None
+        rows = [{'user_id': user_id, 'delta': delta, 'reason': reason, 'ref_id': ref_id,
+                 'created_at': now, 'applied_at': applied_at} for delta, reason, ref_id in awards]
+        if not rows:
+            return 0
+        session = db.session()
+        session.execute(insert(ScoreEvent), rows)
+        self._settle(session, user_id, sum(row['delta'] for row in rows), len(rows))
+        return len(rows)
+
+    def _settle(self, session, user_id: int, delta: int, count: int):
+        """Apply ``delta`` now when running inline, else make sure the aggregator will."""
+        inline = self.interval <= 0
+        if inline:
+            changes = _apply(session.connection(), {user_id: delta})
+            for _, _, new_score in changes:
+                user = session.identity_map.get(session.identity_key(User, user_id))
+                if user is not None:
+                    set_committed_value(user, 'score', new_score)
+            session.info.setdefault(CHANGES_KEY, []).extend(changes)
+        else:
+            self._ensure_running()
+        with self._lock:
+            self.awarded += count
+            if inline:
+                self.applied += count
+
+    def pending(self) -> int:
+        return db.session.query(func.count(ScoreEvent.id)).filter(ScoreEvent.applied_at.is_(None)).scalar()
+
+    def flush(self, limit: Optional[int] = None) -> int:
+        """
+        Fold up to ``limit`` (default ``batch_size``) of the oldest unapplied
+        events into ``User.score`` in one transaction on its own connection.
+
+        The events are claimed with a conditional UPDATE first; if another
+        aggregator got any of them, the whole batch rolls back and 0 is
+        returned. Otherwise returns the number of events applied.
+        """
+        limit = limit or self.batch_size
+        started = time.perf_counter()
+        events = ScoreEvent.__table__
+        try:
+            with db.engine.begin() as conn:
+                rows = conn.execute(
+                    select(events.c.id, events.c.user_id, events.c.delta)
+                    .where(events.c.applied_at.is_(None))
+                    .order_by(events.c.id)
+                    .limit(limit)
+                ).all()
+                if not rows:
+                    return 0
+                ids = [row.id for row in rows]
+                claimed = conn.execute(
+                    update(events)
+                    .where(events.c.id.in_(ids), events.c.applied_at.is_(None))
+                    .values(applied_at=datetime.utcnow())
+                ).rowcount
+                if claimed != len(ids):
+                    raise _Conflict()
+                totals = defaultdict(int)
+                for row in rows:
+                    totals[row.user_id] += row.delta
+                changes = _apply(conn, totals)
+        except _Conflict:
+            with self._lock:
+                self.conflicts += 1
+            return 0
+
+        _publish(changes)
+        with self._lock:
+            self.applied += len(rows)
+            self.flushes += 1
+            self.last_flush_seconds = time.perf_counter() - started
+        return len(rows)
+
+    def flush_all(self) -> int:
+        """Flush batches until no unapplied events are left; returns the total applied."""
+        total = 0
+        while True:
+            applied = self.flush()
+            total += applied
+            if applied < self.batch_size:
+                return total
+
+    def _run(self, stop: threading.Event):
+        while not stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.flush_all()
+            except Exception:
+                logger.exception("Folding score events failed; retrying in %.1f s", self.interval)
+                with self._lock:
+                    self.errors += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'interval_seconds': self.interval,
+                'awarded': self.awarded,
+                'applied': self.applied,
+                'flushes': self.flushes,
+                'conflicts': self.conflicts,
+                'errors': self.errors,
+                'last_flush_seconds': self.last_flush_seconds
+            }
+
+
+score_ledger = ScoreLedger()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_inline_changes(session):
+    _publish(session.info.pop(CHANGES_KEY, ()))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_inline_changes(session):
+    session.info.pop(CHANGES_KEY, None)
@@ -0,0 +1,108 @@
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import exists, func, insert, select
+
+from connectapp.extensions import db
+from connectapp.models import FriendSuggestion, User, connections
+
+MAX_SUGGESTIONS = 20
+
+
+def _ranked_candidates(user_ids: Optional[Iterable[int]], limit: int):
+    """
+    Set-based friend-of-friend query: one row per (user, candidate) pair with
+    the mutual-connection count, ranked by mutuals and then candidate score.
+    """
+    c1 = connections.alias('c1')  # user -> friend
+    c2 = connections.alias('c2')  # friend -> candidate
+    c3 = connections.alias('c3')  # user -> candidate (must not exist)
+
+    mutual_count = func.count().label('mutual_count')
+    ranked = select(
+        c1.c.user_id.label('user_id'),
+        c2.c.friend_id.label('candidate_id'),
+        mutual_count,
+        func.row_number().over(
+            partition_by=c1.c.user_id,
+            order_by=(func.count().desc(), func.coalesce(User.score, 0).desc(), c2.c.friend_id)
+        ).label('rank')
+    ).select_from(
+        c1.join(c2, c2.c.user_id == c1.c.friend_id)
+          .join(User, User.id == c2.c.friend_id)
+    ).where(
+        c2.c.friend_id != c1.c.user_id,
+        ~exists().where(c3.c.user_id == c1.c.user_id, c3.c.friend_id == c2.c.friend_id)
+    ).group_by(c1.c.user_id, c2.c.friend_id, User.score)
+
+    if user_ids is not None:
+        ranked = ranked.where(c1.c.user_id.in_(list(user_ids)))
+
+    ranked = ranked.subquery('ranked')
+    return select(ranked.c.user_id, ranked.c.candidate_id, ranked.c.mutual_count, ranked.c.rank) \
+        .where(ranked.c.rank <= limit)
+
+
+def refresh_suggestions(user_ids: Optional[Iterable[int]] = None, limit: int = MAX_SUGGESTIONS) -> int:
+    """
+    Recompute suggestions with a single INSERT ... SELECT.
+
+    Args:
+        user_ids: Only rebuild these users; ``None`` rebuilds everyone.
+        limit: Suggestions kept per user.
+
+    Returns:
+        Number of suggestion rows written.
+    """
+    if user_ids is not None:
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return 0
+
+    delete = db.delete(FriendSuggestion)
+    if user_ids is not None:
+        delete = delete.where(FriendSuggestion.user_id.in_(user_ids))
+    db.session.execute(delete)
+
+    result = db.session.execute(
+        insert(FriendSuggestion).from_select(
+            ['user_id', 'candidate_id', 'mutual_count', 'rank'],
+            _ranked_candidates(user_ids, limit)
+        )
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def refresh_after_connection(user_id: int, friend_id: int) -> int:
+    """
+    Incremental refresh for a new mutual edge.
+
+    Only the two endpoints and their direct friends can gain or lose
+    2-hop candidates, so only their rows are rebuilt.
+    """
+    affected = {user_id, friend_id}
+    rows = db.session.execute(
+        select(connections.c.friend_id).where(connections.c.user_id.in_([user_id, friend_id]))
+    )
+    affected.update(friend for (friend,) in rows)
+    return refresh_suggestions(affected)
+
+
+def get_suggestions(user_id: int, limit: int = 10) -> List[Dict]:
+    """Read precomputed suggestions for ``user_id`` (an index range scan)."""
+    rows = db.session.query(
+        FriendSuggestion.candidate_id, FriendSuggestion.mutual_count, User.name, User.profile_pic
+    ).join(User, User.id == FriendSuggestion.candidate_id) \
+        .filter(FriendSuggestion.user_id == user_id) \
+        .order_by(FriendSuggestion.rank) \
+        .limit(limit).all()
+
+    return [
+        {
+            'id': row.candidate_id,
+            'name': row.name,
+            'mutual_connections': row.mutual_count,
+            'profile_pic': row.profile_pic
+        }
+        for row in rows
+    ]
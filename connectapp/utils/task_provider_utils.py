@@ -0,0 +1,250 @@
+import logging
+import random
+import string
+from datetime import datetime
+from itertools import product
+from typing import Dict, List, Tuple
+
+from connectapp.extensions import db
+from connectapp.models import DailyTask, User
+from connectapp.utils.gemini_utils import determine_difficulty, generate_daily_task
+from connectapp.utils.inventory_utils import task_inventory
+from connectapp.utils.job_utils import job_queue
+from connectapp.utils.progress_utils import get_user_progress, save_rebuilt_progress
+
+logger = logging.getLogger(__name__)
+
+# Phrase slots shared by the templates below
+SLOTS = {
+    'person': ["a coworker", "a neighbor", "a classmate", "the barista you see most often",
+               "someone at the gym", "a family member", "the person who sits nearest to you"],
+    'old_friend': ["a friend you haven't talked to in a month", "an old classmate",
+                   "a former coworker", "a cousin you rarely see"],
+    'stranger': ["someone you've never talked to", "a new face at work",
+                 "someone waiting in line with you", "a person sitting alone"],
+    'topic': ["their favorite book", "a recent trip", "what they do for fun on weekends",
+              "the best meal they've had lately", "a skill they are learning", "a show they love"],
+    'activity': ["a coffee break", "a short walk", "lunch", "a board game evening", "a workout"],
+    'place': ["a coffee shop", "the office kitchen", "a community event", "the park", "a class or club meeting"],
+    'group': ["two friends", "your team", "a few neighbors", "people from a club you belong to"],
+    'compliment': ["their work", "their outfit", "a good idea they had", "how they handled something tricky"],
+}
+
+TEMPLATES = {
+    'easy': [
+        "Smile and say hello to {person} today.",
+        "Ask {person} how their day is going and really listen to the answer.",
+        "Send a short 'thinking of you' message to {old_friend}.",
+        "Thank {person} for something specific they did recently.",
+        "Compliment {person} on {compliment}.",
+    ],
+    'medium': [
+        "Ask {person} about {topic} and share one of your own stories.",
+        "Invite {person} to {activity} this week.",
+        "Call {old_friend} and ask about {topic}.",
+        "Compliment {person} on {compliment} and ask how they got good at it.",
+        "Start a conversation with {stranger} at {place}.",
+    ],
+    'hard': [
+        "Introduce yourself to {stranger} at {place} and find one thing you have in common.",
+        "Organize {activity} with {group} and invite someone you don't know well.",
+        "Have a 15-minute conversation with {stranger} about {topic} without checking your phone.",
+        "Reconnect with {old_friend} and set a date for {activity}.",
+        "Ask {stranger} at {place} about {topic} and swap contact details if you click.",
+    ],
+}
+
+
+def _difficulty(user_progress: Dict) -> str:
+    completed_tasks = user_progress.get('completed_tasks', [])
+    return determine_difficulty(
+        user_progress.get('difficulty_preference', 'medium'),
+        user_progress.get('success_rate', 0.5),
+        user_progress.get('completed_count', len(completed_tasks))
+    )
+
+
+def _expand(templates: List[str]) -> Tuple[str, ...]:
+    """Every concrete text the templates can produce, so generating one is a single random pick."""
+    formatter = string.Formatter()
+    texts = []
+    for template in templates:
+        fields = [field for _, field, _, _ in formatter.parse(template) if field]
+        for values in product(*(SLOTS[field] for field in fields)):
+            texts.append(template.format(**dict(zip(fields, values))))
+    return tuple(texts)
+
+
+class TaskProvider:
+    """Produces a daily task for a user's progress snapshot (see ``get_user_progress``)."""
+
+    name = ''
+    remote = False  # True if generate() waits on the network
+
+    def generate(self, user_progress: Dict) -> Dict:
+        """Return a dict with task_text, difficulty and created_at."""
+        raise NotImplementedError
+
+    def for_batch(self) -> 'TaskProvider':
+        """Provider to use when latency doesn't matter (pre-generation)."""
+        return self
+
+    def task_created(self, task: DailyTask):
+        """Called once a task this provider generated has been committed."""
+
+
+class LocalTaskProvider(TaskProvider):
+    """
+    Template engine: difficulty-aware challenges from a phrase corpus with
+    no network access.
+
+    The corpus is expanded once per process into a few hundred texts per
+    difficulty; generating is a random pick that skips the user's recent
+    tasks.
+    """
+
+    name = 'local'
+
+    def __init__(self, seed=None):
+        self.corpus = {difficulty: _expand(templates) for difficulty, templates in TEMPLATES.items()}
+        self._random = random.Random(seed)
+
+    def generate(self, user_progress: Dict) -> Dict:
+        difficulty = _difficulty(user_progress)
+        texts = self.corpus[difficulty]
+        recent = set(user_progress.get('completed_tasks', []))
+        task_text = self._random.choice(texts)
+        for _ in range(5):
+            if task_text not in recent:
+                break
+            task_text = self._random.choice(texts)
+        return {
+            'task_text': task_text,
+            'difficulty': difficulty,
+            'created_at': datetime.utcnow().isoformat()
+        }
+
+
+class GeminiTaskProvider(TaskProvider):
+    """Gemini-written tasks; when Gemini can't answer, a local template task instead of a canned string."""
+
+    name = 'gemini'
+    remote = True
+
+    def __init__(self, local: LocalTaskProvider):
+        self.local = local
+
+    def generate(self, user_progress: Dict) -> Dict:
+        task_data = generate_daily_task(user_progress)
+        if task_data.get('fallback'):
+            return self.local.generate(user_progress)
+        return task_data
+
+
+class InventoryTaskProvider(TaskProvider):
+    """
+    Claims a pre-generated task from the shared inventory (see
+    ``inventory_utils``); the local engine covers an empty pool while it
+    is being refilled.
+    """
+
+    name = 'inventory'
+
+    def __init__(self, local: LocalTaskProvider):
+        self.local = local
+
+    def generate(self, user_progress: Dict) -> Dict:
+        difficulty = _difficulty(user_progress)
+        task_text = None
+        if user_progress.get('user_id') is not None:
+            task_text = task_inventory.claim(user_progress['user_id'], difficulty)
+        if task_text is None:
+            return self.local.generate(user_progress)
+        return {
+            'task_text': task_text,
+            'difficulty': difficulty,
+            'created_at': datetime.utcnow().isoformat()
+        }
+
+
+class HybridTaskProvider(TaskProvider):
+    """
+    Serve a local template task at once, then upgrade it to a Gemini task
+    in the background (an ``upgrade_task`` job).
+
+    The upgrade only replaces the text if the user hasn't completed,
+    simplified or replaced the task in the meantime, and only with a real
+    Gemini answer.
+    """
+
+    name = 'hybrid'
+
+    def __init__(self, local: LocalTaskProvider, upstream: GeminiTaskProvider):
+        self.local = local
+        self.upstream = upstream
+
+    def generate(self, user_progress: Dict) -> Dict:
+        return self.local.generate(user_progress)
+
+    def for_batch(self) -> TaskProvider:
+        return self.upstream
+
+    def task_created(self, task: DailyTask):
+        try:
+            job_queue.submit('upgrade_task', task.user_id, task_id=task.id, input_text=task.task_text)
+        except Exception:
+            # The local task is perfectly usable; just don't upgrade it
+            logger.exception("Could not queue upgrade for task %s", task.id)
+            db.session.rollback()
+
+
+def _untouched(job):
+    """The job's task, as long as the user hasn't completed, simplified or replaced it."""
+    return db.and_(
+        DailyTask.id == job.task_id,
+        DailyTask.task_text == job.input_text,
+        DailyTask.completed == False,
+        db.func.coalesce(DailyTask.simplified_count, 0) == 0
+    )
+
+
+def _run_upgrade_job(job):
+    """Job handler: swap a local task's text for a Gemini one if it is still untouched."""
+    task = db.session.get(DailyTask, job.task_id) if job.task_id else None
+    if task is None or task.completed or task.simplified_count or task.task_text != job.input_text:
+        return task.task_text if task else ''
+    user_progress = get_user_progress(db.session.get(User, job.user_id))
+    save_rebuilt_progress()  # don't hold a rebuilt progress row open across the Gemini call
+    task_data = generate_daily_task(user_progress)
+    if task_data.get('fallback'):
+        return job.input_text
+    # The call can take seconds; only write if the task is still untouched now
+    upgraded = db.session.query(DailyTask).filter(_untouched(job)) \
+        .update({DailyTask.task_text: task_data['task_text']}, synchronize_session=False)
+    db.session.expire(task, ['task_text'])
+    return task_data['task_text'] if upgraded else task.task_text
+
+
+job_queue.register('upgrade_task', _run_upgrade_job)
+
+_local = LocalTaskProvider()
+PROVIDERS = {
+    'local': lambda: _local,
+    'gemini': lambda: GeminiTaskProvider(_local),
+    'inventory': lambda: InventoryTaskProvider(_local),
+    'hybrid': lambda: HybridTaskProvider(_local, GeminiTaskProvider(_local)),
+}
+
+_provider: TaskProvider = PROVIDERS['gemini']()
+
+
+def configure_task_provider(name: str):
+    """Select the process-wide provider by name (``TASK_PROVIDER``: gemini, local, inventory or hybrid)."""
+    global _provider
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown task provider: {name} (expected one of {', '.join(sorted(PROVIDERS))})")
+    _provider = PROVIDERS[name]()
+
+
+def get_task_provider() -> TaskProvider:
+    return _provider
@@ -0,0 +1,124 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from connectapp.extensions import db
+from connectapp.models import User
+
+DIRTY_KEY = 'user_cache_dirty'
+
+
+class SessionUserCache:
+    """
+    Per-process cache of the logged-in user's column values.
+
+    ``load()`` turns a cached snapshot back into a persistent ``User`` in the
+    current session via ``merge(load=False)``, so Flask-Login's user loader
+    needs no query; attribute changes and lazy relationships work as usual.
+
+    Every committed ORM change to a ``User`` drops that user's snapshot and
+    bumps a single cache-wide version, so a concurrent loader that started
+    before the change won't store what it read. Bulk SQL updates must call ``invalidate()``
+    themselves. Writes from other processes show up within ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = 10.0, max_users: int = 50000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.served_age_total = 0.0
+        self.served_age_max = 0.0
+        self._entries: Dict[int, tuple] = {}  # user_id -> (loaded_at, snapshot)
+        self._version = 0
+        self._lock = threading.Lock()
+        self._columns = [column.key for column in User.__mapper__.column_attrs]
+
+    def configure(self, ttl: float, max_users: int):
+        with self._lock:
+            self.ttl = ttl
+            self.max_users = max_users
+            self._entries.clear()
+
+    def load(self, user_id: int) -> Optional[User]:
+        if self.ttl <= 0:
+            return db.session.get(User, user_id)
+
+        now = time.monotonic()
+        with self._lock:
+            version = self._version
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[0] <= self.ttl:
+                age = now - entry[0]
+                self.hits += 1
+                self.served_age_total += age
+                self.served_age_max = max(self.served_age_max, age)
+                snapshot = entry[1]
+            else:
+                snapshot = None
+                self.misses += 1
+
+        if snapshot is not None:
+            user = User(**snapshot)
+            make_transient_to_detached(user)  # looks freshly loaded: no pending changes
+            return db.session.merge(user, load=False)
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            self._store(user, version)
+        return user
+
+    def _store(self, user: User, version: int):
+        snapshot = {key: getattr(user, key) for key in self._columns}
+        with self._lock:
+            if self._version != version:
+                return  # a user changed while we were loading; don't risk caching old values
+            if len(self._entries) >= self.max_users:
+                self._entries.clear()
+            self._entries[user.id] = (time.monotonic(), snapshot)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._version += 1
+            self._entries.pop(user_id, None)
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'cached_users': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'avg_served_age_seconds': self.served_age_total / self.hits if self.hits else 0.0,
+                'max_served_age_seconds': self.served_age_max
+            }
+
+
+session_user_cache = SessionUserCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault(DIRTY_KEY, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop(DIRTY_KEY, ()):
+        session_user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop(DIRTY_KEY, None)
@@ -0,0 +1,17 @@
+function pollJob(jobId, onDone, interval) {
+  interval = interval || 500;
+  fetch(`/api/jobs/${jobId}`, { headers: { 'Accept': 'application/json' } })
+    .then(response => response.json())
+    .then(data => {
+      if (!data.success) {
+        return;
+      }
+      const job = data.job;
+      if (job.status === 'done' || job.status === 'failed') {
+        onDone(job);
+      } else {
+        setTimeout(() => pollJob(jobId, onDone, Math.min(interval * 1.5, 3000)), interval);
+      }
+    })
+    .catch(() => setTimeout(() => pollJob(jobId, onDone, 3000), 3000));
+}